@@ -2,6 +2,8 @@ from flask import Flask
 from flask_login import LoginManager
 from config import Config
 from extensions import db
+import click
+import logging
 import os
 
 def create_app():
@@ -10,12 +12,22 @@ def create_app():
                 template_folder=os.path.join(basedir, 'templates'),
                 static_folder=os.path.join(basedir, 'static'))
     app.config.from_object(Config)
+    logging.basicConfig(level=app.config['LOG_LEVEL'],
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
 
     instance_path = os.path.join(basedir, 'instance')
     os.makedirs(instance_path, exist_ok=True)
 
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    from services.pool_metricas import opciones_motor
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', opciones_motor(app.config))
     db.init_app(app)
+    from services import instrumentacion_sql
+    instrumentacion_sql.init_app(app)
+    from services import metricas
+    metricas.init_app(app)
+    from services import eventos
+    eventos.init_app(app)
 
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -24,16 +36,11 @@ def create_app():
 
     @login_manager.user_loader
     def load_user(user_id):
-        from models import Usuario
-        return Usuario.query.get(int(user_id))
-
-    with app.app_context():
-        from models import db as models_db
-        db.create_all()
-        print("Tablas creadas (o ya existían).")
-        from seed import seed_if_empty
-        seed_if_empty()
+        from services import sesion_cache
+        return sesion_cache.cargar(int(user_id))
 
+    # El arranque no toca la base de datos: el esquema y los datos iniciales
+    # se crean con "flask db-init" y "flask seed" (una vez por despliegue).
     from routes.main import bp as main_bp
     from routes.productos import bp as productos_bp
     from routes.clientes import bp as clientes_bp
@@ -42,6 +49,9 @@ def create_app():
     from routes.usuarios import bp as usuarios_bp
     from routes.auth import bp as auth_bp
     from routes.reportes import bp as reportes_bp
+    from routes.metricas import bp as metricas_bp
+    from routes.api import bp as api_bp
+    from routes.cocina import bp as cocina_bp
 
     app.register_blueprint(main_bp)
     app.register_blueprint(productos_bp, url_prefix='/productos')
@@ -51,5 +61,89 @@ def create_app():
     app.register_blueprint(usuarios_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(reportes_bp)
+    app.register_blueprint(metricas_bp)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(cocina_bp)
+
+    @app.cli.command("db-init")
+    def db_init():
+        """Crea las tablas que falten (no modifica las existentes)."""
+        import models  # registra todos los modelos en db.metadata
+        db.create_all()
+        click.echo("Tablas creadas (o ya existían).")
+
+    @app.cli.command("seed")
+    def seed():
+        """Inserta productos y clientes iniciales si las tablas están vacías."""
+        from seed import seed_if_empty
+        seed_if_empty()
+
+    @app.cli.command("migrar-fechas")
+    @click.option("--lote", default=1000, help="Filas convertidas por lote.")
+    @click.option("--forzar", is_flag=True, help="Marca las fechas ilegibles como 1970-01-01 en vez de abortar.")
+    def migrar_fechas(lote, forzar):
+        """Convierte pedidos.fecha a DATETIME y la indexa. Ejecutar con la aplicación detenida."""
+        from migraciones import migrar_fecha_pedidos
+        migrar_fecha_pedidos(lote, forzar)
+
+    @app.cli.command("migrar-clientes-usuarios")
+    @click.option("--lote", default=1000, help="Usuarios revisados por lote.")
+    def migrar_clientes_usuarios(lote):
+        """Añade usuarios.cliente_id y lo rellena a partir del email."""
+        from migraciones import migrar_cliente_usuarios
+        migrar_cliente_usuarios(lote)
+
+    @app.cli.command("indexar-clientes")
+    def indexar_clientes():
+        """Crea los índices de búsqueda de clientes (FULLTEXT en MySQL)."""
+        from migraciones import crear_indices_busqueda_clientes
+        crear_indices_busqueda_clientes()
+
+    @app.cli.command("indexar-cocina")
+    def indexar_cocina():
+        """Crea el índice (estado, id) que usa la cola de cocina."""
+        from migraciones import crear_indice_cola_cocina
+        crear_indice_cola_cocina()
+
+    @app.cli.command("podar-cambios")
+    def podar_cambios():
+        """Borra de pedido_cambios las filas de más de un día."""
+        from services.cocina_service import podar_cambios as podar
+        click.echo(f"Cambios eliminados: {podar()}")
+
+    @app.cli.command("reconstruir-ventas")
+    def reconstruir_ventas():
+        """Recalcula desde cero los resúmenes diarios de ventas."""
+        from services.ventas_service import reconstruir
+        reconstruir()
+        click.echo("Resúmenes de ventas reconstruidos.")
+
+    @app.cli.command("consolidar-ventas")
+    def consolidar_ventas():
+        """Aplica a los resúmenes diarios los deltas de ventas pendientes."""
+        from services.ventas_service import consolidar
+        click.echo(f"Deltas consolidados: {consolidar()}.")
+
+    @app.cli.command("importar")
+    @click.argument("entidad", type=click.Choice(["productos", "clientes"]))
+    @click.argument("archivo", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--lote", default=1000, help="Filas validadas e insertadas por lote.")
+    def importar(entidad, archivo, lote):
+        """Importa productos o clientes desde CSV, JSON o JSON Lines."""
+        from services import importacion_service
+        formato = importacion_service.formato_de(archivo)
+        if not formato:
+            raise click.BadParameter("usa un archivo .csv, .json o .jsonl", param_hint="ARCHIVO")
+        importar_fn = (importacion_service.importar_productos if entidad == "productos"
+                       else importacion_service.importar_clientes)
+        with open(archivo, "rb") as f:
+            resultado = importar_fn(importacion_service.leer_registros(f, formato), lote)
+        click.echo(f"Leídas: {resultado['leidos']} · Insertadas: {resultado['insertados']} · "
+              f"Rechazadas: {resultado['rechazados']}")
+        for error in resultado["errores"]:
+            click.echo(f"  {error}")
+        if resultado["detenido"]:
+            click.echo(f"Importación detenida: {resultado['detenido']}. Las filas anteriores quedaron guardadas.")
+            raise SystemExit(1)
 
     return app
\ No newline at end of file
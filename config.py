@@ -4,4 +4,39 @@ from conexion.conexion import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    CATALOGO_CACHE_TTL = int(os.environ.get('CATALOGO_CACHE_TTL', 60))
+    SESION_CACHE_TTL = int(os.environ.get('SESION_CACHE_TTL', 30))
+    SESION_CACHE_MAX = int(os.environ.get('SESION_CACHE_MAX', 1000))
+    REPORTES_WORKERS = int(os.environ.get('REPORTES_WORKERS', 2))
+    # Segundos sin avance tras los que un trabajo de reporte se da por perdido
+    REPORTES_TRABAJO_TIMEOUT = int(os.environ.get('REPORTES_TRABAJO_TIMEOUT', 900))
+
+    # Pool de conexiones por proceso (cada worker de gunicorn abre el suyo):
+    # conexiones máximas por worker = DB_POOL_SIZE + DB_MAX_OVERFLOW
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 280))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') not in ('0', 'false', 'False')
+    DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 5))
+    DB_READ_TIMEOUT = int(os.environ.get('DB_READ_TIMEOUT', 30))
+
+    # Instrumentación SQL por petición (cabeceras X-DB-Queries / Server-Timing)
+    SQL_INSTRUMENTACION = os.environ.get('SQL_INSTRUMENTACION', '1') not in ('0', 'false', 'False')
+    SQL_LENTO_MS = int(os.environ.get('SQL_LENTO_MS', 200))
+    SQL_LENTO_LOG = os.environ.get('SQL_LENTO_LOG', '')  # vacío: instance/sql_lento.log
+
+    # Métricas Prometheus en /metrics (compartidas entre workers vía METRICAS_DIR)
+    METRICAS_DIR = os.environ.get('METRICAS_DIR', '')  # vacío: instance/metricas
+    METRICAS_INTERVALO = float(os.environ.get('METRICAS_INTERVALO', 1.0))
+    # Vacío: /metrics solo para administradores o desde localhost (detrás de un
+    # proxy en la misma máquina todas las peticiones parecen locales: define el token)
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+
+    # Eventos de pedidos (SSE): "local" (un proceso), "archivo" (workers de la
+    # misma máquina vía EVENTOS_DIR) o "modulo:Clase" para un backend propio
+    EVENTOS_BACKEND = os.environ.get('EVENTOS_BACKEND', 'local')
+    EVENTOS_DIR = os.environ.get('EVENTOS_DIR', '')  # vacío: instance/eventos
+    EVENTOS_LATIDO = int(os.environ.get('EVENTOS_LATIDO', 15))
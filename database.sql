@@ -72,12 +72,14 @@ DROP TABLE IF EXISTS `pedidos`;
 CREATE TABLE `pedidos` (
   `id` int NOT NULL AUTO_INCREMENT,
   `cliente_id` int NOT NULL,
-  `fecha` varchar(30) NOT NULL,
+  `fecha` datetime NOT NULL,
   `estado` varchar(50) NOT NULL,
   `notas` text,
   `total` float NOT NULL,
   PRIMARY KEY (`id`),
   KEY `cliente_id` (`cliente_id`),
+  KEY `ix_pedidos_estado_fecha` (`estado`,`fecha`),
+  KEY `ix_pedidos_fecha_id` (`fecha`,`id`),
   CONSTRAINT `pedidos_ibfk_1` FOREIGN KEY (`cliente_id`) REFERENCES `clientes` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=3 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -0,0 +1,59 @@
+"""Mide el arranque en frío de la aplicación (lo que tarda un worker nuevo).
+
+Uso:
+    python medir_arranque.py [--repeticiones N] [--legado]
+
+Cada repetición es un proceso de Python nuevo que importa app y llama a
+create_app(). Con --legado se mide además lo que hacía el arranque antes
+(create_all + seed_if_empty + importar reportlab) para comparar.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import os
+
+CODIGO = """
+import time
+inicio = time.perf_counter()
+from app import create_app
+app = create_app()
+if {legado}:
+    import reportlab.platypus
+    from extensions import db
+    from seed import seed_if_empty
+    with app.app_context():
+        import models
+        db.create_all()
+        seed_if_empty()
+print(time.perf_counter() - inicio)
+"""
+
+def medir(legado, repeticiones):
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    tiempos = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", CODIGO.format(legado=legado)],
+            cwd=directorio, capture_output=True, text=True,
+        )
+        if salida.returncode != 0:
+            ultima = (salida.stderr.strip().splitlines() or ["sin detalle"])[-1]
+            sys.exit(f"El arranque falló: {ultima}")
+        tiempos.append(float(salida.stdout.strip().splitlines()[-1]))
+    return tiempos
+
+def _resumen(etiqueta, tiempos):
+    print(f"{etiqueta:<8} mediana {statistics.median(tiempos) * 1000:8.1f} ms · "
+          f"mín {min(tiempos) * 1000:8.1f} ms · máx {max(tiempos) * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--legado", action="store_true",
+                        help="medir también el arranque con create_all y seed")
+    args = parser.parse_args()
+
+    _resumen("actual", medir(False, args.repeticiones))
+    if args.legado:
+        _resumen("legado", medir(True, args.repeticiones))
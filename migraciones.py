@@ -0,0 +1,182 @@
+from datetime import datetime
+import click
+from sqlalchemy import bindparam, inspect, text
+from extensions import db
+
+FORMATO_FECHA_LEGADO = "%Y-%m-%d %H:%M:%S"
+
+def _columnas(tabla):
+    return {c["name"]: c for c in inspect(db.engine).get_columns(tabla)}
+
+def _indices(tabla):
+    return {i["name"] for i in inspect(db.engine).get_indexes(tabla)}
+
+def _rellenar_fecha_dt(tamano_lote, forzar):
+    """Copia fecha a fecha_dt por lotes en las filas que aún no la tienen.
+
+    Si hay fechas vacías o ilegibles aborta sin tocarlas, salvo con forzar,
+    que las marca como 1970-01-01 e informa cuántas fueron.
+    """
+    convertidos = 0
+    ilegibles = []
+    ultimo_id = 0
+    while True:
+        filas = db.session.execute(
+            text("SELECT id, fecha FROM pedidos WHERE id > :ultimo AND fecha_dt IS NULL "
+                 "ORDER BY id LIMIT :lote"),
+            {"ultimo": ultimo_id, "lote": tamano_lote},
+        ).all()
+        if not filas:
+            break
+        valores = []
+        for pedido_id, fecha in filas:
+            try:
+                fecha_dt = datetime.strptime(fecha.strip(), FORMATO_FECHA_LEGADO)
+            except (AttributeError, ValueError):
+                ilegibles.append(pedido_id)
+                if not forzar:
+                    continue
+                fecha_dt = datetime(1970, 1, 1)
+            valores.append({"id": pedido_id, "fecha_dt": fecha_dt})
+        if valores:
+            db.session.execute(text("UPDATE pedidos SET fecha_dt = :fecha_dt WHERE id = :id"), valores)
+        db.session.commit()
+        convertidos += len(valores)
+        ultimo_id = filas[-1][0]
+        click.echo(f"Pedidos convertidos: {convertidos}")
+
+    if ilegibles:
+        muestra = ", ".join(f"#{i}" for i in ilegibles[:20]) + (" ..." if len(ilegibles) > 20 else "")
+        if not forzar:
+            raise click.ClickException(
+                f"{len(ilegibles)} pedido(s) con fecha vacía o ilegible ({muestra}). "
+                "Corrígelas y vuelve a ejecutar, o usa --forzar para marcarlas como 1970-01-01.")
+        click.echo(f"{len(ilegibles)} pedido(s) con fecha ilegible marcados como 1970-01-01: {muestra}")
+
+def migrar_fecha_pedidos(tamano_lote=1000, forzar=False):
+    """Convierte pedidos.fecha de VARCHAR a DATETIME con sus índices.
+
+    Pasos (idempotentes, se puede relanzar si se interrumpe):
+      1. Añade la columna temporal fecha_dt.
+      2. La rellena por lotes de tamano_lote filas recorriendo por id. Si
+         hay fechas vacías o ilegibles se detiene aquí (ver _rellenar_fecha_dt).
+      3. Repite el relleno justo antes del cambio para cubrir los pedidos
+         creados entretanto y sustituye la columna fecha por fecha_dt.
+      4. Crea los índices ix_pedidos_estado_fecha e ix_pedidos_fecha_id.
+
+    Entre la última pasada y el cambio de columna aún puede colarse un pedido
+    nuevo, así que el paso 3 debe hacerse con la aplicación detenida.
+    """
+    columnas = _columnas("pedidos")
+    es_mysql = db.engine.dialect.name == "mysql"
+    if "fecha" in columnas:
+        tipo_fecha = str(columnas["fecha"]["type"]).upper()
+        pendiente = "DATETIME" not in tipo_fecha and "TIMESTAMP" not in tipo_fecha
+    else:
+        # Se interrumpió justo después de eliminar la columna antigua
+        pendiente = True
+
+    if pendiente and "fecha" in columnas:
+        if "fecha_dt" not in columnas:
+            db.session.execute(text("ALTER TABLE pedidos ADD COLUMN fecha_dt DATETIME NULL"))
+            db.session.commit()
+
+        _rellenar_fecha_dt(tamano_lote, forzar)
+        # Pedidos creados mientras corría la primera pasada
+        _rellenar_fecha_dt(tamano_lote, forzar)
+        db.session.execute(text("ALTER TABLE pedidos DROP COLUMN fecha"))
+        db.session.commit()
+
+    if pendiente:
+        if es_mysql:
+            db.session.execute(text("ALTER TABLE pedidos CHANGE fecha_dt fecha DATETIME NOT NULL"))
+        else:
+            db.session.execute(text("ALTER TABLE pedidos RENAME COLUMN fecha_dt TO fecha"))
+        db.session.commit()
+
+    existentes = _indices("pedidos")
+    for nombre, columnas_indice in (("ix_pedidos_estado_fecha", "estado, fecha"), ("ix_pedidos_fecha_id", "fecha, id")):
+        if nombre not in existentes:
+            db.session.execute(text(f"CREATE INDEX {nombre} ON pedidos ({columnas_indice})"))
+            db.session.commit()
+    click.echo("Migración de pedidos.fecha completada.")
+
+def migrar_cliente_usuarios(tamano_lote=1000):
+    """Añade usuarios.cliente_id (FK a clientes) y lo rellena por email.
+
+    Pasos (idempotentes):
+      1. Añade la columna cliente_id y su índice.
+      2. Recorre por lotes de tamano_lote los usuarios sin cliente, busca sus
+         clientes con una consulta IN por lote y los vincula con executemany.
+      3. En MySQL crea la clave foránea fk_usuarios_cliente.
+    """
+    es_mysql = db.engine.dialect.name == "mysql"
+    if "cliente_id" not in _columnas("usuarios"):
+        db.session.execute(text("ALTER TABLE usuarios ADD COLUMN cliente_id INT NULL"))
+        db.session.commit()
+    if "ix_usuarios_cliente_id" not in _indices("usuarios"):
+        db.session.execute(text("CREATE INDEX ix_usuarios_cliente_id ON usuarios (cliente_id)"))
+        db.session.commit()
+
+    vinculados = 0
+    ultimo_id = 0
+    while True:
+        filas = db.session.execute(
+            text("SELECT id, mail FROM usuarios WHERE id > :ultimo AND cliente_id IS NULL "
+                 "ORDER BY id LIMIT :lote"),
+            {"ultimo": ultimo_id, "lote": tamano_lote},
+        ).all()
+        if not filas:
+            break
+        ultimo_id = filas[-1][0]
+        correos = {mail.lower(): usuario_id for usuario_id, mail in filas if mail}
+        if correos:
+            clientes = db.session.execute(
+                text("SELECT id, email FROM clientes WHERE email IN :correos")
+                .bindparams(bindparam("correos", expanding=True)),
+                {"correos": list(correos)},
+            ).all()
+            valores = [{"usuario": correos[email.lower()], "cliente": cliente_id}
+                       for cliente_id, email in clientes if email and email.lower() in correos]
+            if valores:
+                db.session.execute(text("UPDATE usuarios SET cliente_id = :cliente WHERE id = :usuario"), valores)
+                vinculados += len(valores)
+        db.session.commit()
+        click.echo(f"Usuarios revisados hasta id {ultimo_id}; vinculados: {vinculados}")
+
+    if es_mysql:
+        claves = {fk["name"] for fk in inspect(db.engine).get_foreign_keys("usuarios")}
+        if "fk_usuarios_cliente" not in claves:
+            db.session.execute(text(
+                "ALTER TABLE usuarios ADD CONSTRAINT fk_usuarios_cliente "
+                "FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE SET NULL"))
+            db.session.commit()
+    click.echo("Migración de usuarios.cliente_id completada.")
+
+def crear_indices_busqueda_clientes():
+    """Crea los índices que usa la búsqueda de clientes (idempotente)."""
+    existentes = _indices("clientes")
+    indices = [
+        ("ix_clientes_nombre", "CREATE INDEX ix_clientes_nombre ON clientes (nombre)"),
+        ("ix_clientes_telefono", "CREATE INDEX ix_clientes_telefono ON clientes (telefono)"),
+    ]
+    if db.engine.dialect.name == "mysql":
+        indices.append(("ft_clientes_nombre_email",
+                        "CREATE FULLTEXT INDEX ft_clientes_nombre_email ON clientes (nombre, email)"))
+    for nombre, ddl in indices:
+        if nombre not in existentes:
+            db.session.execute(text(ddl))
+            db.session.commit()
+            click.echo(f"Índice {nombre} creado.")
+    click.echo("Índices de búsqueda de clientes listos.")
+
+def crear_indice_cola_cocina():
+    """Crea el índice (estado, id) de la cola de cocina (idempotente).
+
+    La tabla pedido_cambios la crea "flask db-init" si no existe.
+    """
+    if "ix_pedidos_estado_id" not in _indices("pedidos"):
+        db.session.execute(text("CREATE INDEX ix_pedidos_estado_id ON pedidos (estado, id)"))
+        db.session.commit()
+        click.echo("Índice ix_pedidos_estado_id creado.")
+    click.echo("Índice de la cola de cocina listo.")
@@ -16,6 +16,11 @@ class Producto(db.Model):
 
 class Cliente(db.Model):
     __tablename__ = 'clientes'
+    __table_args__ = (
+        db.Index('ix_clientes_nombre', 'nombre'),
+        db.Index('ix_clientes_telefono', 'telefono'),
+        db.Index('ft_clientes_nombre_email', 'nombre', 'email', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
     id       = db.Column(db.Integer, primary_key=True)
     nombre   = db.Column(db.String(200), nullable=False)
     cedula   = db.Column(db.String(20),  unique=True)
@@ -25,9 +30,14 @@ class Cliente(db.Model):
 
 class Pedido(db.Model):
     __tablename__ = 'pedidos'
+    __table_args__ = (
+        db.Index('ix_pedidos_estado_fecha', 'estado', 'fecha'),
+        db.Index('ix_pedidos_estado_id', 'estado', 'id'),
+        db.Index('ix_pedidos_fecha_id', 'fecha', 'id'),
+    )
     id         = db.Column(db.Integer, primary_key=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
-    fecha      = db.Column(db.String(30),  nullable=False)
+    fecha      = db.Column(db.DateTime,    nullable=False)
     estado     = db.Column(db.String(50),  nullable=False)
     notas      = db.Column(db.Text, default='')
     total      = db.Column(db.Float, nullable=False)
@@ -48,6 +58,51 @@ class PedidoItem(db.Model):
     producto = db.relationship('Producto')
 
 
+class PedidoCambio(db.Model):
+    """Registro de altas y cambios de estado de pedidos (cursor de la cola de cocina)."""
+    __tablename__ = 'pedido_cambios'
+    id        = db.Column(db.Integer, primary_key=True)
+    pedido_id = db.Column(db.Integer, db.ForeignKey('pedidos.id'), nullable=False, index=True)
+    estado    = db.Column(db.String(50), nullable=False)
+    fecha     = db.Column(db.DateTime,   nullable=False)
+
+
+class VentaDiaria(db.Model):
+    """Resumen diario por producto, mantenido de forma incremental."""
+    __tablename__ = 'ventas_diarias'
+    dia         = db.Column(db.Date,    primary_key=True)
+    producto_id = db.Column(db.Integer, db.ForeignKey('productos.id'), primary_key=True)
+    unidades    = db.Column(db.Integer, nullable=False, default=0)
+    ingresos    = db.Column(db.Float,   nullable=False, default=0)
+
+
+class PedidosDiarios(db.Model):
+    """Número de pedidos por día (de creación) y estado actual."""
+    __tablename__ = 'pedidos_diarios'
+    dia      = db.Column(db.Date,       primary_key=True)
+    estado   = db.Column(db.String(50), primary_key=True)
+    cantidad = db.Column(db.Integer,    nullable=False, default=0)
+
+
+class ResumenPendiente(db.Model):
+    """Deltas de los resúmenes diarios aún no consolidados (solo se insertan en la transacción del pedido)."""
+    __tablename__ = 'resumen_pendientes'
+    id          = db.Column(db.Integer, primary_key=True)
+    dia         = db.Column(db.Date,    nullable=False)
+    producto_id = db.Column(db.Integer, nullable=True)    # delta de ventas_diarias
+    estado      = db.Column(db.String(50), nullable=True)  # delta de pedidos_diarios
+    unidades    = db.Column(db.Integer, nullable=False, default=0)
+    ingresos    = db.Column(db.Float,   nullable=False, default=0)
+    cantidad    = db.Column(db.Integer, nullable=False, default=0)
+
+
+class TablaVersion(db.Model):
+    """Contador de cambios por tabla; se incrementa en la misma transacción que la escritura."""
+    __tablename__ = 'tabla_versiones'
+    tabla   = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
 class Usuario(UserMixin, db.Model):
     __tablename__ = 'usuarios'
     id       = db.Column(db.Integer,     primary_key=True)
@@ -56,6 +111,10 @@ class Usuario(UserMixin, db.Model):
     telefono = db.Column(db.String(20))
     password = db.Column(db.String(200), nullable=False)
     rol      = db.Column(db.String(20),  nullable=False, default='cliente')
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id', ondelete='SET NULL'),
+                           nullable=True, index=True)
+
+    cliente = db.relationship('Cliente')
 
     def set_password(self, raw):
         self.password = generate_password_hash(raw)
@@ -15,18 +15,24 @@ CREATE TABLE IF NOT EXISTS clientes (
     nombre VARCHAR(200) NOT NULL,
     cedula VARCHAR(20) UNIQUE,
     email VARCHAR(120) UNIQUE,
-    telefono VARCHAR(20)
+    telefono VARCHAR(20),
+    INDEX ix_clientes_nombre (nombre),
+    INDEX ix_clientes_telefono (telefono),
+    FULLTEXT INDEX ft_clientes_nombre_email (nombre, email)
 );
 
 -- Tabla pedidos
 CREATE TABLE IF NOT EXISTS pedidos (
     id INT PRIMARY KEY AUTO_INCREMENT,
     cliente_id INT NOT NULL,
-    fecha VARCHAR(30) NOT NULL,
+    fecha DATETIME NOT NULL,
     estado VARCHAR(50) NOT NULL,
     notas TEXT DEFAULT '',
     total FLOAT NOT NULL,
-    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE RESTRICT
+    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE RESTRICT,
+    INDEX ix_pedidos_estado_fecha (estado, fecha),
+    INDEX ix_pedidos_estado_id (estado, id),
+    INDEX ix_pedidos_fecha_id (fecha, id)
 );
 
 -- Tabla pedido_items
@@ -41,6 +47,16 @@ CREATE TABLE IF NOT EXISTS pedido_items (
     FOREIGN KEY (producto_id) REFERENCES productos(id) ON DELETE RESTRICT
 );
 
+-- Tabla pedido_cambios (altas y cambios de estado; cursor de la cola de cocina)
+CREATE TABLE IF NOT EXISTS pedido_cambios (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    pedido_id INT NOT NULL,
+    estado VARCHAR(50) NOT NULL,
+    fecha DATETIME NOT NULL,
+    INDEX ix_pedido_cambios_pedido_id (pedido_id),
+    FOREIGN KEY (pedido_id) REFERENCES pedidos(id) ON DELETE CASCADE
+);
+
 -- Tabla usuarios
 CREATE TABLE IF NOT EXISTS usuarios (
     id INT PRIMARY KEY AUTO_INCREMENT,
@@ -48,5 +64,43 @@ CREATE TABLE IF NOT EXISTS usuarios (
     mail VARCHAR(120) NOT NULL UNIQUE,
     telefono VARCHAR(20),
     password VARCHAR(200) NOT NULL,
-    rol VARCHAR(20) NOT NULL DEFAULT 'cliente'
-);
\ No newline at end of file
+    rol VARCHAR(20) NOT NULL DEFAULT 'cliente',
+    cliente_id INT NULL,
+    INDEX ix_usuarios_cliente_id (cliente_id),
+    CONSTRAINT fk_usuarios_cliente FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE SET NULL
+);
+
+-- Tabla ventas_diarias (resumen incremental por día y producto)
+CREATE TABLE IF NOT EXISTS ventas_diarias (
+    dia DATE NOT NULL,
+    producto_id INT NOT NULL,
+    unidades INT NOT NULL DEFAULT 0,
+    ingresos FLOAT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, producto_id),
+    FOREIGN KEY (producto_id) REFERENCES productos(id) ON DELETE RESTRICT
+);
+
+-- Tabla pedidos_diarios (resumen incremental por día y estado)
+CREATE TABLE IF NOT EXISTS pedidos_diarios (
+    dia DATE NOT NULL,
+    estado VARCHAR(50) NOT NULL,
+    cantidad INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, estado)
+);
+
+-- Tabla tabla_versiones (contador de cambios por tabla para la caché de reportes)
+CREATE TABLE IF NOT EXISTS tabla_versiones (
+    tabla VARCHAR(50) NOT NULL PRIMARY KEY,
+    version INT NOT NULL DEFAULT 0
+);
+
+-- Tabla resumen_pendientes (deltas de ventas_diarias/pedidos_diarios por consolidar)
+CREATE TABLE IF NOT EXISTS resumen_pendientes (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    dia DATE NOT NULL,
+    producto_id INT NULL,
+    estado VARCHAR(50) NULL,
+    unidades INT NOT NULL DEFAULT 0,
+    ingresos FLOAT NOT NULL DEFAULT 0,
+    cantidad INT NOT NULL DEFAULT 0
+);
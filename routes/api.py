@@ -0,0 +1,182 @@
+import json
+from functools import wraps
+from flask import Blueprint, Response, request
+from flask_login import current_user
+from sqlalchemy import select
+from extensions import db
+from models import Pedido, Cliente
+from services import catalogo_cache, busqueda_clientes
+from services.pedido_service import crear_pedido, cliente_de_usuario
+
+# API JSON v1 para kioscos y apps móviles. Reutiliza los servicios de las
+# vistas HTML, responde JSON compacto, admite ?fields=a,b para proyectar y
+# usa ETag/If-None-Match en las lecturas para que el sondeo reciba 304.
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+CAMPOS_PRODUCTO = ("slug", "id", "nombre", "precio", "stock", "img", "desc")
+CAMPOS_PEDIDO = ("id", "cliente_id", "fecha", "estado", "notas", "total")
+CAMPOS_CLIENTE = ("id", "nombre", "cedula", "email", "telefono")
+LIMITE_CLIENTES = 100
+MAX_LIMITE_CLIENTES = 500
+
+
+class ErrorApi(Exception):
+    def __init__(self, mensaje, estado=400):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+@bp.errorhandler(ErrorApi)
+def _error_api(e):
+    return _json({"error": str(e)}, e.estado)
+
+
+def _json(datos, estado=200, condicional=False):
+    cuerpo = json.dumps(datos, ensure_ascii=False, separators=(",", ":"), default=str)
+    response = Response(cuerpo, status=estado, mimetype="application/json")
+    if condicional:
+        response.add_etag()
+        response.headers["Cache-Control"] = "no-cache"
+        response.make_conditional(request)
+    return response
+
+
+def _requiere_sesion(solo_admin=False):
+    """Como login_required/admin_required, pero responde 401/403 en JSON."""
+    def decorador(f):
+        @wraps(f)
+        def envoltura(*args, **kwargs):
+            if not current_user.is_authenticated:
+                raise ErrorApi("Autenticación requerida.", 401)
+            if solo_admin and not current_user.es_admin:
+                raise ErrorApi("Necesitas privilegios de administrador.", 403)
+            return f(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def _campos(permitidos):
+    """Campos pedidos en ?fields= (todos si no se indica)."""
+    crudo = request.args.get("fields", "").strip()
+    if not crudo:
+        return permitidos
+    campos = tuple(c.strip() for c in crudo.split(",") if c.strip())
+    desconocidos = [c for c in campos if c not in permitidos]
+    if desconocidos:
+        raise ErrorApi(f"Campos no válidos: {', '.join(desconocidos)}. "
+                       f"Disponibles: {', '.join(permitidos)}.")
+    return campos
+
+
+def _proyectar(registro, campos):
+    return {c: registro[c] for c in campos}
+
+
+# ---------- Catálogo ----------
+@bp.route("/menu")
+def menu():
+    campos = _campos(CAMPOS_PRODUCTO)
+    productos = [_proyectar({"slug": slug, **datos}, campos)
+                 for slug, datos in catalogo_cache.get_menu().items()]
+    return _json({"productos": productos}, condicional=True)
+
+
+@bp.route("/productos/<slug>")
+def producto(slug):
+    datos = catalogo_cache.get_menu().get(slug.lower())
+    if datos is None:
+        raise ErrorApi("Producto no encontrado.", 404)
+    return _json(_proyectar({"slug": slug.lower(), **datos}, _campos(CAMPOS_PRODUCTO)), condicional=True)
+
+
+# ---------- Pedidos ----------
+def _pedido_dict(pedido):
+    return {
+        "id": pedido.id,
+        "cliente_id": pedido.cliente_id,
+        "fecha": pedido.fecha.isoformat(),
+        "estado": pedido.estado,
+        "notas": pedido.notas,
+        "total": pedido.total,
+    }
+
+
+@bp.route("/pedidos", methods=["POST"])
+@_requiere_sesion()
+def crear():
+    """Cuerpo: {"lineas": [{"producto": slug, "cantidad": n}], "notas": "", "cliente_id": (solo admin)}."""
+    # Todo se valida antes de crear el pedido: un 4xx garantiza que no se escribió nada
+    campos = _campos(CAMPOS_PEDIDO)
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict):
+        raise ErrorApi("Se esperaba un objeto JSON.")
+
+    lineas = []
+    for linea in datos.get("lineas") or []:
+        if not isinstance(linea, dict):
+            raise ErrorApi("Cada línea debe ser un objeto {producto, cantidad}.")
+        slug = str(linea.get("producto") or "").lower().strip()
+        cantidad = linea.get("cantidad", 1)
+        if not slug:
+            raise ErrorApi("Cada línea necesita un producto.")
+        if not isinstance(cantidad, int) or isinstance(cantidad, bool) or cantidad <= 0:
+            raise ErrorApi("La cantidad debe ser un número entero positivo.")
+        lineas.append((slug, cantidad))
+    if not lineas:
+        raise ErrorApi("Debes indicar al menos una línea.")
+
+    if current_user.es_admin:
+        cliente_id = datos.get("cliente_id")
+        if not isinstance(cliente_id, int) or isinstance(cliente_id, bool) or db.session.get(Cliente, cliente_id) is None:
+            raise ErrorApi("cliente_id no válido.")
+    else:
+        cliente_id, _ = cliente_de_usuario(current_user)
+
+    try:
+        pedido = crear_pedido(cliente_id, lineas, str(datos.get("notas") or "").strip())
+    except ValueError as e:
+        raise ErrorApi(str(e))
+    return _json(_proyectar(_pedido_dict(pedido), campos), 201)
+
+
+@bp.route("/pedidos/<int:pedido_id>")
+@_requiere_sesion()
+def estado_pedido(pedido_id):
+    campos = _campos(CAMPOS_PEDIDO)
+    pedido = db.session.get(Pedido, pedido_id)
+    if pedido is None:
+        raise ErrorApi("Pedido no encontrado.", 404)
+    if not current_user.es_admin and pedido.cliente_id != current_user.cliente_id:
+        raise ErrorApi("No tienes permiso para ver este pedido.", 403)
+    return _json(_proyectar(_pedido_dict(pedido), campos), condicional=True)
+
+
+# ---------- Clientes (solo admin) ----------
+@bp.route("/clientes")
+@_requiere_sesion(solo_admin=True)
+def clientes():
+    """?q= busca por relevancia; sin q pagina por id con ?cursor= y ?limite=."""
+    campos = _campos(CAMPOS_CLIENTE)
+    limite = min(max(request.args.get("limite", LIMITE_CLIENTES, type=int), 1), MAX_LIMITE_CLIENTES)
+    columnas = [getattr(Cliente, c) for c in campos]
+    q = (request.args.get("q") or "").strip()
+    siguiente = None
+
+    if q:
+        ids = busqueda_clientes.buscar(q, limite)
+        orden = {cliente_id: i for i, cliente_id in enumerate(ids)}
+        filas = db.session.execute(select(Cliente.id, *columnas).where(Cliente.id.in_(ids))).all() if ids else []
+        filas.sort(key=lambda fila: orden[fila[0]])
+    else:
+        cursor = request.args.get("cursor", 0, type=int)
+        filas = db.session.execute(
+            select(Cliente.id, *columnas).where(Cliente.id > cursor).order_by(Cliente.id).limit(limite + 1)
+        ).all()
+        if len(filas) > limite:
+            filas = filas[:limite]
+            siguiente = filas[-1][0]
+
+    return _json({
+        "clientes": [dict(zip(campos, fila[1:])) for fila in filas],
+        "siguiente": siguiente,
+    })
@@ -3,10 +3,13 @@ from flask_login import login_required
 from extensions import db, admin_required
 from forms.cliente_form import ClienteForm
 from services.cliente_service import get_all, get_by_id, create, update, delete
-from models import Cliente
-from sqlalchemy import or_
+from services.importacion_service import formato_de, leer_registros, importar_clientes
+from models import Cliente, Pedido
+from services import busqueda_clientes
+from sqlalchemy import func
 
 bp = Blueprint("clientes", __name__)
+POR_PAGINA = 50
 
 def _email_ya_existe(email: str, exclude_id: int | None = None) -> bool:
     if not email:
@@ -28,30 +31,40 @@ def _cedula_ya_existe(cedula: str, exclude_id: int | None = None) -> bool:
 @admin_required
 def index():
     q = (request.args.get("q") or "").strip()
+    page = request.args.get("page", 1, type=int)
+
+    # Conteo de pedidos por cliente en una sola subconsulta agrupada
+    conteo = db.session.query(
+        Pedido.cliente_id, func.count(Pedido.id).label("total")
+    ).group_by(Pedido.cliente_id).subquery()
+
+    query = Cliente.query.outerjoin(conteo, conteo.c.cliente_id == Cliente.id) \
+        .add_columns(func.coalesce(conteo.c.total, 0).label("pedidos_count"))
     if q:
-        like = f"%{q}%"
-        clientes = Cliente.query.filter(
-            or_(
-                Cliente.nombre.ilike(like),
-                Cliente.cedula.ilike(like),
-                Cliente.email.ilike(like),
-                Cliente.telefono.ilike(like)
-            )
-        ).order_by(Cliente.nombre).all()
+        # Búsqueda indexada: los mejores resultados por relevancia, sin paginar
+        ids = busqueda_clientes.buscar(q)
+        orden = {cliente_id: i for i, cliente_id in enumerate(ids)}
+        filas = query.filter(Cliente.id.in_(ids)).all() if ids else []
+        filas.sort(key=lambda fila: orden[fila[0].id])
+        pagina = None
     else:
-        clientes = get_all()
+        pagina = query.order_by(Cliente.nombre, Cliente.id).paginate(
+            page=page, per_page=POR_PAGINA, error_out=False
+        )
+        filas = pagina.items
 
     clientes_list = []
-    for c in clientes:
+    for c, pedidos_count in filas:
         clientes_list.append({
             "id": c.id,
             "nombre": c.nombre,
             "cedula": c.cedula,
             "email": c.email,
             "telefono": c.telefono,
-            "pedidos_count": len(c.pedidos)
+            "pedidos_count": pedidos_count
         })
-    return render_template("clientes/list.html", titulo="Clientes", clientes=clientes_list, q=q)
+    return render_template("clientes/list.html", titulo="Clientes", clientes=clientes_list, q=q, pagina=pagina,
+                           limite=busqueda_clientes.LIMITE)
 
 @bp.route("/nuevo", methods=["GET", "POST"])
 @admin_required
@@ -112,4 +125,31 @@ def eliminar(cliente_id: int):
         flash("Cliente eliminado.", "success")
     except ValueError as e:
         flash(str(e), "error")
-    return redirect(url_for("clientes.index"))
\ No newline at end of file
+    return redirect(url_for("clientes.index"))
+
+@bp.route("/importar", methods=["GET", "POST"])
+@admin_required
+def importar():
+    resultado = None
+    if request.method == "POST":
+        archivo = request.files.get("archivo")
+        formato = formato_de(archivo.filename if archivo else "")
+        if not formato:
+            flash("Sube un archivo .csv, .json o .jsonl.", "error")
+            return redirect(url_for("clientes.importar"))
+        try:
+            resultado = importar_clientes(leer_registros(archivo.stream, formato))
+            if resultado["detenido"]:
+                flash(f"Importación incompleta: se guardaron {resultado['insertados']} clientes y se detuvo por "
+                      f"{resultado['detenido']}.", "error")
+            else:
+                flash(f"Importación terminada: {resultado['insertados']} clientes nuevos.", "success")
+        except ValueError as e:
+            flash(f"Error al leer el archivo: {str(e)}", "error")
+    return render_template(
+        "importar.html",
+        titulo="Importar clientes",
+        columnas=["nombre", "cedula", "email", "telefono"],
+        volver=url_for("clientes.index"),
+        resultado=resultado,
+    )
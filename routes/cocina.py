@@ -0,0 +1,19 @@
+from flask import Blueprint, render_template, request, jsonify
+from extensions import admin_required
+from services import cocina_service
+
+bp = Blueprint("cocina", __name__, url_prefix="/cocina")
+
+@bp.route("/")
+@admin_required
+def pantalla():
+    return render_template("pedidos/cocina.html", titulo="Cocina")
+
+@bp.route("/cola")
+@admin_required
+def cola():
+    """Sin ?desde= devuelve la cola completa; con ?desde=<cursor>, solo los cambios."""
+    desde = request.args.get("desde", type=int)
+    if desde is None:
+        return jsonify(cocina_service.cola())
+    return jsonify(cocina_service.cambios_desde(desde))
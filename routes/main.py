@@ -1,28 +1,26 @@
-from flask import Blueprint, render_template
-from models import Producto
+from flask import Blueprint, render_template, jsonify
+from extensions import db, admin_required
+from services import catalogo_cache, pool_metricas, instrumentacion_sql
 
 bp = Blueprint("main", __name__)
 
-def _fetch_menu_dict():
-    productos = Producto.query.order_by(Producto.id.desc()).all()
-    menu = {}
-    for p in productos:
-        menu[p.slug] = {
-            "id": p.id,
-            "nombre": p.nombre,
-            "precio": p.precio,
-            "stock": p.stock,
-            "img": p.img or "",
-            "desc": p.descripcion or "",
-        }
-    return menu
-
 @bp.route("/")
 def home():
-    menu = _fetch_menu_dict()
+    menu = catalogo_cache.get_menu()
     destacados = ["capuccino", "mocaccino", "latte"]
     return render_template("index.html", titulo="Inicio", menu=menu, destacados=destacados)
 
 @bp.route("/about")
 def about():
-    return render_template("about.html", titulo="Acerca de")
\ No newline at end of file
+    return render_template("about.html", titulo="Acerca de")
+
+@bp.route("/estado/pool")
+@admin_required
+def estado_pool():
+    return jsonify(pool_metricas.estadisticas(db.engine))
+
+
+@bp.route("/estado/sql")
+@admin_required
+def estado_sql():
+    return jsonify(instrumentacion_sql.estadisticas())
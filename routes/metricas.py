@@ -0,0 +1,25 @@
+import hmac
+import ipaddress
+from flask import Blueprint, Response, current_app, request, abort
+from flask_login import current_user
+from services import metricas
+
+bp = Blueprint("metricas", __name__)
+
+def _desde_localhost():
+    try:
+        return ipaddress.ip_address(request.remote_addr or "").is_loopback
+    except ValueError:
+        return False
+
+@bp.route("/metrics")
+def metrics():
+    # Con METRICAS_TOKEN el scraper debe enviar "Authorization: Bearer <token>";
+    # sin él, solo se sirven a administradores o a peticiones desde localhost
+    token = current_app.config.get("METRICAS_TOKEN")
+    if token:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            abort(401)
+    elif not (_desde_localhost() or (current_user.is_authenticated and current_user.es_admin)):
+        abort(403)
+    return Response(metricas.exposicion(), mimetype="text/plain; version=0.0.4; charset=utf-8")
@@ -1,42 +1,109 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response, current_app
 from flask_login import login_required, current_user
 from extensions import db, admin_required
 from models import Pedido, Cliente, Producto, PedidoItem, Usuario
-from datetime import datetime
-import re
+from services import sesion_cache, eventos
+from services.pedido_service import (
+    ESTADOS_PERMITIDOS, crear_pedido, cliente_de_usuario, cambiar_estado as cambiar_estado_pedido, cambiar_estado_lote,
+)
+from validaciones import validar_cedula, validar_telefono
+from datetime import datetime, timedelta
+import json
+import queue
+from urllib.parse import urlsplit, parse_qsl
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
 
 
 bp = Blueprint("pedidos", __name__)
-ESTADOS_PERMITIDOS = ["En preparación", "Listo", "Entregado", "Cancelado"]
+POR_PAGINA = 25
 
-# Validaciones para cliente
-def validar_cedula(cedula):
-    return re.match(r'^\d{10}$', cedula) is not None
+# ---------- Listado de pedidos (solo admin) ----------
+def _parse_fecha(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d") if valor else None
+    except ValueError:
+        return None
 
-def validar_telefono(telefono):
-    return re.match(r'^09\d{8}$', telefono) is not None
+def _pagina_pedidos(estado, desde, hasta, cursor, direccion):
+    """Página de pedidos por keyset sobre Pedido.id (sin OFFSET).
+
+    Trae el nombre del cliente en la misma consulta mediante un join. El
+    rango de fechas [desde, hasta] usa el índice (estado, fecha) cuando se
+    filtra por estado y el índice (fecha, id) cuando no.
+    Devuelve (filas, hay_anterior, hay_siguiente) con las filas ordenadas
+    de forma descendente por id.
+    """
+    query = db.session.query(
+        Pedido.id, Pedido.fecha, Pedido.estado, Pedido.total, Cliente.nombre
+    ).outerjoin(Cliente, Pedido.cliente_id == Cliente.id)
+    if estado:
+        query = query.filter(Pedido.estado == estado)
+    if desde:
+        query = query.filter(Pedido.fecha >= desde)
+    if hasta:
+        query = query.filter(Pedido.fecha < hasta + timedelta(days=1))
+
+    if cursor and direccion == "ant":
+        # Página más reciente que el cursor: se busca en orden ascendente y se invierte
+        filas = query.filter(Pedido.id > cursor).order_by(Pedido.id.asc()).limit(POR_PAGINA + 1).all()
+        hay_anterior = len(filas) > POR_PAGINA
+        filas = list(reversed(filas[:POR_PAGINA]))
+        hay_siguiente = True
+    else:
+        if cursor:
+            query = query.filter(Pedido.id < cursor)
+        filas = query.order_by(Pedido.id.desc()).limit(POR_PAGINA + 1).all()
+        hay_siguiente = len(filas) > POR_PAGINA
+        filas = filas[:POR_PAGINA]
+        hay_anterior = bool(cursor)
+    return filas, hay_anterior, hay_siguiente
 
-# ---------- Listado de pedidos (solo admin) ----------
 @bp.route("/")
 @admin_required
 def index():
     estado = (request.args.get("estado") or "").strip()
-    if estado:
-        pedidos = Pedido.query.filter_by(estado=estado).order_by(Pedido.id.desc()).all()
-    else:
-        pedidos = Pedido.query.order_by(Pedido.id.desc()).all()
+    desde_raw = (request.args.get("desde") or "").strip()
+    hasta_raw = (request.args.get("hasta") or "").strip()
+    desde, hasta = _parse_fecha(desde_raw), _parse_fecha(hasta_raw)
+    if (desde_raw and not desde) or (hasta_raw and not hasta):
+        flash("Las fechas deben tener el formato AAAA-MM-DD.", "error")
+    cursor = request.args.get("cursor", type=int)
+    direccion = (request.args.get("dir") or "sig").strip()
+
+    filas, hay_anterior, hay_siguiente = _pagina_pedidos(estado, desde, hasta, cursor, direccion)
     pedidos_list = []
-    for p in pedidos:
+    for p in filas:
         pedidos_list.append({
             "id": p.id,
             "fecha": p.fecha,
             "estado": p.estado,
             "total": p.total,
-            "cliente_nombre": p.cliente.nombre if p.cliente else "Desconocido",
+            "cliente_nombre": p.nombre or "Desconocido",
         })
-    return render_template("pedidos/list.html", titulo="Pedidos", pedidos=pedidos_list, estado=estado)
+
+    cursor_anterior = pedidos_list[0]["id"] if pedidos_list and hay_anterior else None
+    cursor_siguiente = pedidos_list[-1]["id"] if pedidos_list and hay_siguiente else None
+    return render_template(
+        "pedidos/list.html",
+        titulo="Pedidos",
+        pedidos=pedidos_list,
+        estado=estado,
+        desde=desde.strftime("%Y-%m-%d") if desde else "",
+        hasta=hasta.strftime("%Y-%m-%d") if hasta else "",
+        cursor_anterior=cursor_anterior,
+        cursor_siguiente=cursor_siguiente,
+        estados=ESTADOS_PERMITIDOS,
+    )
 
 # ---------- Crear pedido ----------
+def _cliente_id_propio():
+    """Id del cliente del usuario actual; lo vincula o crea si falta."""
+    cliente_id, creado = cliente_de_usuario(current_user)
+    if creado:
+        flash("Se ha creado tu perfil de cliente automáticamente.", "info")
+    return cliente_id
+
 @bp.route("/nuevo", methods=["GET", "POST"])
 @login_required
 def nuevo():
@@ -57,13 +124,7 @@ def nuevo():
             )
         else:
             # Cliente normal: usar su propio cliente
-            cliente = Cliente.query.filter_by(email=current_user.mail).first()
-            if not cliente:
-                # Crear automáticamente si no existe
-                cliente = Cliente(nombre=current_user.nombre, email=current_user.mail)
-                db.session.add(cliente)
-                db.session.commit()
-                flash("Se ha creado tu perfil de cliente automáticamente.", "info")
+            cliente = db.session.get(Cliente, _cliente_id_propio())
             return render_template(
                 "pedidos/nuevo_cliente.html",
                 titulo="Nuevo pedido",
@@ -112,16 +173,21 @@ def nuevo():
                             nombre=cliente_nombre,
                             mail=cliente_email,
                             telefono=cliente_telefono,   # guardamos el teléfono
-                            rol='cliente'
+                            rol='cliente',
+                            cliente_id=cliente_id
                         )
                         nuevo_usuario.set_password('cliente123')
                         db.session.add(nuevo_usuario)
                         flash("Usuario creado automáticamente con los mismos datos del cliente.", "info")
                     else:
+                        if not usuario_existente.cliente_id:
+                            usuario_existente.cliente_id = cliente_id
                         flash("Ya existe un usuario con este email. Se usará el existente.", "info")
 
                 # 3. Confirmar todo
                 db.session.commit()
+                if cliente_email and usuario_existente:
+                    sesion_cache.invalidar(usuario_existente.id)
 
             except Exception as e:
                 db.session.rollback()
@@ -139,93 +205,71 @@ def nuevo():
             cliente_id = cliente.id
     else:
         # Cliente normal: usar su propio cliente
-        cliente = Cliente.query.filter_by(email=current_user.mail).first()
-        if not cliente:
-            # Crear automáticamente si no existe
-            cliente = Cliente(nombre=current_user.nombre, email=current_user.mail)
-            db.session.add(cliente)
-            db.session.commit()
-            flash("Se ha creado tu perfil de cliente automáticamente.", "info")
-        cliente_id = cliente.id
-
-    # Producto y cantidad
-    producto_slug = (request.form.get("producto") or "").lower().strip()
-    cantidad_raw = (request.form.get("cantidad") or "1").strip()
+        cliente_id = _cliente_id_propio()
+
+    # Líneas del carrito: campos "producto" y "cantidad" repetidos
+    slugs = request.form.getlist("producto")
+    cantidades_raw = request.form.getlist("cantidad")
     notas = (request.form.get("notas") or "").strip()
 
-    if not producto_slug:
+    lineas = []
+    for i, slug in enumerate(slugs):
+        producto_slug = (slug or "").lower().strip()
+        if not producto_slug:
+            continue
+        cantidad_raw = (cantidades_raw[i] if i < len(cantidades_raw) else "1").strip() or "1"
+        try:
+            cantidad = int(cantidad_raw)
+            if cantidad <= 0:
+                raise ValueError
+        except ValueError:
+            flash("La cantidad debe ser un número entero positivo.", "error")
+            return redirect(url_for("pedidos.nuevo", producto=producto_slug))
+        lineas.append((producto_slug, cantidad))
+
+    if not lineas:
         flash("Debes seleccionar un producto.", "error")
         return redirect(url_for("pedidos.nuevo"))
 
     try:
-        cantidad = int(cantidad_raw)
-        if cantidad <= 0:
-            raise ValueError
-    except ValueError:
-        flash("La cantidad debe ser un número entero positivo.", "error")
-        return redirect(url_for("pedidos.nuevo", producto=producto_slug))
-
-    producto = Producto.query.filter_by(slug=producto_slug).first()
-    if not producto:
-        flash("Producto no encontrado.", "error")
-        return redirect(url_for("pedidos.nuevo"))
-
-    if producto.stock < cantidad:
-        flash(f"Stock insuficiente para {producto.nombre}. Disponible: {producto.stock}.", "error")
-        return redirect(url_for("pedidos.nuevo", producto=producto_slug))
-
-    # Crear pedido
-    subtotal = round(producto.precio * cantidad, 2)
-    fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    pedido = Pedido(
-        cliente_id=cliente_id,
-        fecha=fecha,
-        estado="En preparación",
-        notas=notas,
-        total=subtotal
-    )
-    db.session.add(pedido)
-    db.session.flush()
-
-    item = PedidoItem(
-        pedido_id=pedido.id,
-        producto_id=producto.id,
-        cantidad=cantidad,
-        precio_unitario=producto.precio,
-        subtotal=subtotal
-    )
-    db.session.add(item)
-    producto.stock -= cantidad
-    db.session.commit()
+        pedido = crear_pedido(cliente_id, lineas, notas)
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for("pedidos.nuevo", producto=lineas[0][0]))
 
     flash(f"Pedido #{pedido.id} registrado correctamente.", "success")
     return redirect(url_for("pedidos.detalle", pedido_id=pedido.id))
 
 # ---------- Detalle de pedido ----------
-@bp.route("/<int:pedido_id>")
-@login_required
-def detalle(pedido_id: int):
-    pedido = Pedido.query.get(pedido_id)
-    if not pedido:
-        flash("Pedido no encontrado.", "error")
-        return redirect(url_for("pedidos.index"))
+def _cargar_detalle(pedido_id):
+    """Pedido con cliente, líneas y productos en una sola consulta (JOINs)."""
+    return db.session.execute(
+        select(Pedido)
+        .options(
+            joinedload(Pedido.cliente),
+            joinedload(Pedido.items).joinedload(PedidoItem.producto),
+        )
+        .where(Pedido.id == pedido_id)
+    ).unique().scalar_one_or_none()
 
-    # Verificar permisos: admin o el cliente asociado al pedido (por email)
-    cliente = pedido.cliente
-    if not current_user.es_admin and (not cliente or cliente.email != current_user.mail):
-        flash("No tienes permiso para ver este pedido.", "error")
-        return redirect(url_for("main.home"))
+def _puede_ver(pedido):
+    # Admin o el cliente vinculado al usuario
+    return current_user.es_admin or (
+        current_user.cliente_id is not None and pedido.cliente_id == current_user.cliente_id
+    )
 
-    items = []
-    for it in pedido.items:
-        items.append({
+def _detalle_dict(pedido):
+    cliente = pedido.cliente
+    items = [
+        {
             "producto_nombre": it.producto.nombre,
             "producto_id": it.producto_id,
             "precio_unitario": it.precio_unitario,
             "cantidad": it.cantidad,
             "subtotal": it.subtotal,
-        })
-
+        }
+        for it in sorted(pedido.items, key=lambda it: it.id)
+    ]
     pedido_dict = {
         "id": pedido.id,
         "fecha": pedido.fecha,
@@ -234,6 +278,21 @@ def detalle(pedido_id: int):
         "total": pedido.total,
         "cliente_nombre": cliente.nombre if cliente else "Desconocido",
     }
+    return pedido_dict, items
+
+@bp.route("/<int:pedido_id>")
+@login_required
+def detalle(pedido_id: int):
+    pedido = _cargar_detalle(pedido_id)
+    if not pedido:
+        flash("Pedido no encontrado.", "error")
+        return redirect(url_for("pedidos.index"))
+
+    if not _puede_ver(pedido):
+        flash("No tienes permiso para ver este pedido.", "error")
+        return redirect(url_for("main.home"))
+
+    pedido_dict, items = _detalle_dict(pedido)
     return render_template(
         "pedidos/detalle.html",
         titulo=f"Pedido #{pedido_id}",
@@ -242,6 +301,58 @@ def detalle(pedido_id: int):
         estados=ESTADOS_PERMITIDOS,
     )
 
+@bp.route("/<int:pedido_id>.json")
+@login_required
+def detalle_json(pedido_id: int):
+    pedido = _cargar_detalle(pedido_id)
+    if not pedido:
+        return jsonify({"error": "Pedido no encontrado."}), 404
+    if not _puede_ver(pedido):
+        return jsonify({"error": "No tienes permiso para ver este pedido."}), 403
+
+    pedido_dict, items = _detalle_dict(pedido)
+    pedido_dict["fecha"] = pedido_dict["fecha"].isoformat()
+    pedido_dict["items"] = items
+    return jsonify(pedido_dict)
+
+# ---------- Eventos en vivo (SSE) ----------
+@bp.route("/eventos")
+@login_required
+def eventos_stream():
+    """Stream text/event-stream con los cambios de estado de pedidos.
+
+    Admin recibe todos; un cliente, solo los de sus pedidos. ?pedido=<id>
+    limita el stream a un pedido concreto.
+    """
+    solo_pedido = request.args.get("pedido", type=int)
+    solo_cliente = None if current_user.es_admin else (current_user.cliente_id or -1)
+    latido = current_app.config.get("EVENTOS_LATIDO", 15)
+
+    def generar(cola):
+        try:
+            yield "retry: 3000\n\n"
+            while not cola.cerrada:
+                try:
+                    evento = cola.get(timeout=latido)
+                except queue.Empty:
+                    yield ": latido\n\n"  # mantiene viva la conexión a través de proxies
+                    continue
+                if cola.cerrada:
+                    break  # descartada por el hub: se pierden eventos, mejor reconectar
+                if solo_pedido and evento.get("id") != solo_pedido:
+                    continue
+                if solo_cliente is not None and evento.get("cliente_id") != solo_cliente:
+                    continue
+                yield f"event: {evento['tipo']}\ndata: {json.dumps(evento, ensure_ascii=False, separators=(',', ':'))}\n\n"
+        finally:
+            eventos.cancelar(cola)
+
+    return Response(
+        generar(eventos.suscribir()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # ---------- Cambiar estado (solo admin) ----------
 @bp.route("/<int:pedido_id>/estado", methods=["POST"])
 @admin_required
@@ -262,15 +373,46 @@ def cambiar_estado(pedido_id: int):
         return redirect(url_for("pedidos.detalle", pedido_id=pedido_id))
 
     try:
-        if estado_anterior != "Cancelado" and nuevo_estado == "Cancelado":
-            for item in pedido.items:
-                producto = item.producto
-                producto.stock += item.cantidad
-        pedido.estado = nuevo_estado
-        db.session.commit()
+        cambiar_estado_pedido(pedido_id, nuevo_estado)
         flash(f"Estado actualizado a '{nuevo_estado}'.", "success")
+    except ValueError as e:
+        flash(str(e), "error")
     except Exception as e:
-        db.session.rollback()
         flash(f"Error al cambiar estado: {str(e)}", "error")
 
-    return redirect(url_for("pedidos.detalle", pedido_id=pedido_id))
\ No newline at end of file
+    return redirect(url_for("pedidos.detalle", pedido_id=pedido_id))
+
+# ---------- Cambiar estado por lotes (solo admin) ----------
+FILTROS_LISTADO = ("estado", "desde", "hasta", "cursor", "dir")
+
+def _destino_lote():
+    """Vuelve al listado conservando solo sus filtros; nunca a una URL arbitraria."""
+    consulta = urlsplit(request.form.get("volver") or "").query
+    filtros = {k: v for k, v in parse_qsl(consulta) if k in FILTROS_LISTADO and v}
+    return url_for("pedidos.index", **filtros)
+
+@bp.route("/estado-lote", methods=["POST"])
+@admin_required
+def cambiar_estado_en_lote():
+    nuevo_estado = (request.form.get("estado") or "").strip()
+    destino = _destino_lote()
+    try:
+        pedido_ids = [int(i) for i in request.form.getlist("pedido_ids")]
+    except ValueError:
+        flash("Selección de pedidos no válida.", "error")
+        return redirect(destino)
+
+    try:
+        resultado = cambiar_estado_lote(pedido_ids, nuevo_estado)
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(destino)
+    except Exception as e:
+        flash(f"Error al cambiar estados: {str(e)}", "error")
+        return redirect(destino)
+
+    mensaje = f"{len(resultado['cambiados'])} pedido(s) pasaron a '{nuevo_estado}'."
+    if resultado["sin_cambio"]:
+        mensaje += f" {len(resultado['sin_cambio'])} ya tenían ese estado."
+    flash(mensaje, "success")
+    return redirect(destino)
@@ -3,27 +3,15 @@ from flask_login import login_required
 from extensions import db, admin_required
 from forms.producto_form import ProductoForm
 from services.producto_service import get_all, get_by_id, create, update, delete
+from services import catalogo_cache
+from services.importacion_service import formato_de, leer_registros, importar_productos
 from models import Producto, PedidoItem
 
 bp = Blueprint("productos", __name__)
 
-def _fetch_menu_dict():
-    productos = Producto.query.order_by(Producto.id.desc()).all()
-    menu = {}
-    for p in productos:
-        menu[p.slug] = {
-            "id": p.id,
-            "nombre": p.nombre,
-            "precio": p.precio,
-            "stock": p.stock,
-            "img": p.img or "",
-            "desc": p.descripcion or "",
-        }
-    return menu
-
 @bp.route("/")
 def index():
-    menu = _fetch_menu_dict()
+    menu = catalogo_cache.get_menu()
     return render_template("productos/menu.html", titulo="Menú", menu=menu)
 
 @bp.route("/<slug>")
@@ -51,7 +39,7 @@ def detalle(slug: str):
 @bp.route("/inventario")
 @admin_required
 def inventario():
-    menu = _fetch_menu_dict()
+    menu = catalogo_cache.get_menu()
     total_skus = len(menu)
     total_stock = sum(p["stock"] for p in menu.values())
     return render_template(
@@ -60,6 +48,7 @@ def inventario():
         menu=menu,
         total_skus=total_skus,
         total_stock=total_stock,
+        cache_stats=catalogo_cache.stats(),
     )
 
 @bp.route("/admin")
@@ -113,4 +102,31 @@ def eliminar(id):
         flash("Producto eliminado", "success")
     except ValueError as e:
         flash(str(e), "error")
-    return redirect(url_for("productos.admin"))
\ No newline at end of file
+    return redirect(url_for("productos.admin"))
+
+@bp.route("/importar", methods=["GET", "POST"])
+@admin_required
+def importar():
+    resultado = None
+    if request.method == "POST":
+        archivo = request.files.get("archivo")
+        formato = formato_de(archivo.filename if archivo else "")
+        if not formato:
+            flash("Sube un archivo .csv, .json o .jsonl.", "error")
+            return redirect(url_for("productos.importar"))
+        try:
+            resultado = importar_productos(leer_registros(archivo.stream, formato))
+            if resultado["detenido"]:
+                flash(f"Importación incompleta: se guardaron {resultado['insertados']} productos y se detuvo por "
+                      f"{resultado['detenido']}.", "error")
+            else:
+                flash(f"Importación terminada: {resultado['insertados']} productos nuevos.", "success")
+        except ValueError as e:
+            flash(f"Error al leer el archivo: {str(e)}", "error")
+    return render_template(
+        "importar.html",
+        titulo="Importar productos",
+        columnas=["slug", "nombre", "precio", "stock", "img", "descripcion"],
+        volver=url_for("productos.admin"),
+        resultado=resultado,
+    )
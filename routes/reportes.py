@@ -1,35 +1,91 @@
-from flask import Blueprint, send_file
+from flask import Blueprint, send_file, current_app, jsonify, abort, url_for, render_template, request, Response, stream_with_context
 from flask_login import login_required
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from io import BytesIO
-from services.producto_service import get_all as get_productos
-from services.cliente_service import get_all as get_clientes
-from services.usuario_service import get_all as get_usuarios
+from sqlalchemy import func, select
+from tempfile import NamedTemporaryFile
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import glob
+import hashlib
+import io
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from extensions import db, admin_required
+from models import Producto, Cliente, Usuario, Pedido, PedidoItem
+from services import versiones, ventas_service
+from services.producto_service import iter_all as iter_productos
+from services.cliente_service import iter_all as iter_clientes
+from services.usuario_service import iter_all as iter_usuarios
 
 bp = Blueprint('reportes', __name__, url_prefix='/reportes')
 
-@bp.route('/productos')
-@login_required
-def productos_pdf():
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-
-    styles = getSampleStyleSheet()
-    title = Paragraph("Listado de Productos", styles['Title'])
-    elements.append(title)
-    elements.append(Spacer(1, 12))
-
-    productos = get_productos()
-    data = [['ID', 'Nombre', 'Precio', 'Stock']]
-    for p in productos:
-        data.append([str(p.id), p.nombre, f"${p.precio:.2f}", str(p.stock)])
-
-    table = Table(data)
-    table.setStyle(TableStyle([
+# Filas por tabla: cada bloque es una Table independiente que se parte entre páginas
+FILAS_POR_BLOQUE = 200
+
+REPORTES = {
+    'productos': {
+        'modelo': Producto,
+        'iterar': iter_productos,
+        'titulo': "Listado de Productos",
+        'encabezados': ['ID', 'Nombre', 'Precio', 'Stock'],
+        'proporciones': [0.1, 0.5, 0.2, 0.2],
+        'fila': lambda p: [str(p.id), p.nombre, f"${p.precio:.2f}", str(p.stock)],
+        # Cada pedido descuenta stock sin tocar tabla_versiones: su última línea entra en la huella
+        'huella_extra': (select(func.max(PedidoItem.id)).scalar_subquery(),),
+    },
+    'clientes': {
+        'modelo': Cliente,
+        'iterar': iter_clientes,
+        'titulo': "Listado de Clientes",
+        'encabezados': ['ID', 'Nombre', 'Cédula', 'Email', 'Teléfono'],
+        'proporciones': [0.08, 0.27, 0.17, 0.31, 0.17],
+        'fila': lambda c: [str(c.id), c.nombre, c.cedula or '-', c.email or '-', c.telefono or '-'],
+    },
+    'usuarios': {
+        'modelo': Usuario,
+        'iterar': iter_usuarios,
+        'titulo': "Listado de Usuarios",
+        'encabezados': ['ID', 'Nombre', 'Email', 'Teléfono', 'Rol'],
+        'proporciones': [0.08, 0.27, 0.35, 0.17, 0.13],
+        'fila': lambda u: [str(u.id), u.nombre, u.mail, u.telefono or '-', u.rol],
+    },
+}
+
+# Exportaciones CSV/NDJSON: columnas por entidad (nunca se exporta usuarios.password)
+EXPORTACIONES = {
+    'productos': (Producto, ['id', 'slug', 'nombre', 'precio', 'stock', 'img', 'descripcion']),
+    'clientes': (Cliente, ['id', 'nombre', 'cedula', 'email', 'telefono']),
+    'usuarios': (Usuario, ['id', 'nombre', 'mail', 'telefono', 'rol']),
+    'pedidos': (Pedido, ['id', 'cliente_id', 'fecha', 'estado', 'notas', 'total']),
+    'pedido_items': (PedidoItem, ['id', 'pedido_id', 'producto_id', 'cantidad', 'precio_unitario', 'subtotal']),
+}
+FORMATOS_EXPORTACION = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+# Filas pedidas al cursor del servidor por cada viaje y agrupadas por fragmento enviado
+FILAS_POR_FRAGMENTO = 1000
+
+# Trabajos en segundo plano: pool local y estado en disco (visible desde cualquier worker)
+_executor = None
+_executor_lock = threading.Lock()
+ID_TRABAJO_RE = re.compile(r'^[0-9a-f]{32}$')
+# Los estados de trabajos más antiguos que esto se borran al encolar uno nuevo
+VIDA_TRABAJO_SEGUNDOS = 24 * 3600
+# Los PDF de versiones anteriores se conservan este tiempo antes de borrarlos
+RETENCION_PDF_SEGUNDOS = 600
+
+
+def _estilo_tabla():
+    # reportlab se importa solo al generar un PDF: así no pesa en el arranque del worker
+    from reportlab.platypus import TableStyle
+    from reportlab.lib import colors
+    return TableStyle([
         ('BACKGROUND', (0,0), (-1,0), colors.grey),
         ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
         ('ALIGN', (0,0), (-1,-1), 'CENTER'),
@@ -37,75 +93,347 @@ def productos_pdf():
         ('BOTTOMPADDING', (0,0), (-1,0), 12),
         ('BACKGROUND', (0,1), (-1,-1), colors.beige),
         ('GRID', (0,0), (-1,-1), 1, colors.black)
-    ]))
-    elements.append(table)
+    ])
+
+
+class _HistoriaPerezosa(list):
+    """Lista de flowables que se rellena desde un generador a medida que
+    reportlab la consume, para no tener todas las tablas en memoria."""
+
+    def __init__(self, iniciales, generador):
+        super().__init__(iniciales)
+        self._generador = generador
+
+    def _rellenar(self):
+        while self._generador is not None and list.__len__(self) < 2:
+            try:
+                self.append(next(self._generador))
+            except StopIteration:
+                self._generador = None
+
+    def __len__(self):
+        self._rellenar()
+        return list.__len__(self)
+
+    def __getitem__(self, indice):
+        self._rellenar()
+        return list.__getitem__(self, indice)
+
+
+def _bloques(encabezados, filas, anchos):
+    from reportlab.platypus import Table
+    estilo = _estilo_tabla()
+    bloque = [encabezados]
+    emitidos = 0
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) > FILAS_POR_BLOQUE:
+            yield Table(bloque, colWidths=anchos, repeatRows=1, style=estilo)
+            emitidos += 1
+            bloque = [encabezados]
+    # Sin filas se emite igualmente la tabla con solo el encabezado
+    if len(bloque) > 1 or not emitidos:
+        yield Table(bloque, colWidths=anchos, repeatRows=1, style=estilo)
+
+
+def _generar_pdf(destino, titulo, encabezados, filas, proporciones):
+    """Construye el PDF por bloques de FILAS_POR_BLOQUE filas y lo escribe en destino."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+    carpeta = os.path.dirname(destino)
+    with NamedTemporaryFile(dir=carpeta, suffix='.tmp', delete=False) as salida:
+        doc = SimpleDocTemplate(salida, pagesize=letter)
+        anchos = [doc.width * p for p in proporciones]
+
+        styles = getSampleStyleSheet()
+        elements = _HistoriaPerezosa(
+            [Paragraph(titulo, styles['Title']), Spacer(1, 12)],
+            _bloques(encabezados, filas, anchos),
+        )
+        doc.build(elements)
+    # Reemplazo atómico: un lector concurrente nunca ve un PDF a medio escribir
+    os.replace(salida.name, destino)
+
+
+def _carpeta_reportes():
+    carpeta = os.path.join(current_app.instance_path, 'reportes')
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def _asegurar_reporte(nombre, progreso=None):
+    """Devuelve (ruta, etag) del PDF para la versión actual de la tabla.
+
+    El archivo se guarda en instance/reportes con la huella en el nombre; si
+    la tabla no cambió no se ejecuta reportlab en absoluto. progreso, si se
+    indica, recibe la fracción de filas procesadas.
+    """
+    conf = REPORTES[nombre]
+    modelo = conf['modelo']
+    etag = hashlib.sha1(versiones.huella(modelo, *conf.get('huella_extra', ())).encode()).hexdigest()[:20]
+    carpeta = _carpeta_reportes()
+    ruta = os.path.join(carpeta, f"{nombre}-{etag}.pdf")
+
+    if not os.path.exists(ruta):
+        filas = (conf['fila'](x) for x in conf['iterar'](FILAS_POR_BLOQUE))
+        if progreso:
+            total = db.session.query(func.count(modelo.id)).scalar() or 1
+            filas = _contar_filas(filas, total, progreso)
+        _generar_pdf(ruta, conf['titulo'], conf['encabezados'], filas, conf['proporciones'])
+        # Otras versiones pueden estar sirviéndose desde otro worker (o ser más
+        # nuevas): solo se borran las que llevan un rato sin regenerarse
+        limite = time.time() - RETENCION_PDF_SEGUNDOS
+        for viejo in glob.glob(os.path.join(carpeta, f"{nombre}-*.pdf")):
+            if viejo != ruta:
+                try:
+                    if os.path.getmtime(viejo) < limite:
+                        os.remove(viejo)
+                except OSError:
+                    pass
+    return ruta, etag
+
+
+def _contar_filas(filas, total, progreso):
+    for i, fila in enumerate(filas, 1):
+        if i % FILAS_POR_BLOQUE == 0:
+            progreso(min(i / total, 0.99))
+        yield fila
+
+
+def _servir_reporte(nombre):
+    """Sirve el PDF cacheado de la versión actual, con ETag/304."""
+    ruta, etag = _asegurar_reporte(nombre)
+    return send_file(ruta, as_attachment=True, download_name=f"{nombre}.pdf",
+                     mimetype='application/pdf', etag=etag, conditional=True)
+
+
+# ---------- Trabajos en segundo plano ----------
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('REPORTES_WORKERS', 2),
+                thread_name_prefix='reportes',
+            )
+        return _executor
+
+
+def _ruta_trabajo(trabajo_id):
+    carpeta = os.path.join(_carpeta_reportes(), 'trabajos')
+    os.makedirs(carpeta, exist_ok=True)
+    return os.path.join(carpeta, f"{trabajo_id}.json")
+
+
+def _guardar_trabajo(trabajo):
+    ruta = _ruta_trabajo(trabajo['id'])
+    with NamedTemporaryFile('w', dir=os.path.dirname(ruta), suffix='.tmp', delete=False) as f:
+        json.dump(trabajo, f)
+    os.replace(f.name, ruta)
+
+
+def _limpiar_trabajos():
+    limite = time.time() - VIDA_TRABAJO_SEGUNDOS
+    for ruta in glob.glob(os.path.join(_carpeta_reportes(), 'trabajos', '*.json')):
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+        except OSError:
+            pass
+
+
+def _leer_trabajo(trabajo_id):
+    if not ID_TRABAJO_RE.match(trabajo_id):
+        return None
+    ruta = _ruta_trabajo(trabajo_id)
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            trabajo = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if trabajo['estado'] in ('pendiente', 'en_proceso') and _trabajo_huerfano(trabajo):
+        trabajo.update(estado='error', error='El trabajo se interrumpió. Vuelve a solicitar el reporte.')
+        _guardar_trabajo(trabajo)
+    return trabajo
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _trabajo_huerfano(trabajo):
+    """True si el proceso dueño del trabajo murió (reinicio, OOM) y no terminará.
+
+    En el mismo host se comprueba el pid dueño; si el trabajo es de otro host
+    solo se da por perdido cuando lleva en proceso más de
+    REPORTES_TRABAJO_TIMEOUT segundos desde que el worker lo empezó.
+    """
+    if trabajo.get('host') == socket.gethostname():
+        return not _proceso_vivo(trabajo['pid'])
+    limite = current_app.config.get('REPORTES_TRABAJO_TIMEOUT', 900)
+    return trabajo['estado'] == 'en_proceso' and time.time() - trabajo.get('iniciado', time.time()) > limite
 
-    doc.build(elements)
-    buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name='productos.pdf', mimetype='application/pdf')
+
+def _ejecutar_trabajo(app, trabajo):
+    with app.app_context():
+        def progreso(fraccion):
+            trabajo['progreso'] = round(fraccion, 2)
+            _guardar_trabajo(trabajo)
+
+        trabajo.update(estado='en_proceso', iniciado=time.time())
+        _guardar_trabajo(trabajo)
+        try:
+            ruta, _ = _asegurar_reporte(trabajo['reporte'], progreso)
+            trabajo.update(estado='listo', progreso=1.0, archivo=os.path.basename(ruta))
+        except Exception as e:
+            trabajo.update(estado='error', error=str(e))
+        finally:
+            db.session.remove()
+        _guardar_trabajo(trabajo)
+
+
+def _trabajo_json(trabajo):
+    data = {k: trabajo[k] for k in ('id', 'reporte', 'estado', 'progreso')}
+    data['url_estado'] = url_for('reportes.estado_trabajo', trabajo_id=trabajo['id'])
+    if trabajo['estado'] == 'listo':
+        data['url_descarga'] = url_for('reportes.descargar_trabajo', trabajo_id=trabajo['id'])
+    if trabajo.get('error'):
+        data['error'] = trabajo['error']
+    return data
+
+
+@bp.route('/<nombre>/trabajos', methods=['POST'])
+@login_required
+def encolar_reporte(nombre):
+    if nombre not in REPORTES:
+        abort(404)
+    _limpiar_trabajos()
+    trabajo = {'id': uuid.uuid4().hex, 'reporte': nombre, 'estado': 'pendiente', 'progreso': 0.0,
+               'host': socket.gethostname(), 'pid': os.getpid()}
+    _guardar_trabajo(trabajo)
+    _get_executor().submit(_ejecutar_trabajo, current_app._get_current_object(), dict(trabajo))
+    return jsonify(_trabajo_json(trabajo)), 202
+
+
+@bp.route('/trabajos/<trabajo_id>')
+@login_required
+def estado_trabajo(trabajo_id):
+    trabajo = _leer_trabajo(trabajo_id)
+    if not trabajo:
+        abort(404)
+    return jsonify(_trabajo_json(trabajo))
+
+
+@bp.route('/trabajos/<trabajo_id>/descarga')
+@login_required
+def descargar_trabajo(trabajo_id):
+    trabajo = _leer_trabajo(trabajo_id)
+    if not trabajo:
+        abort(404)
+    if trabajo['estado'] != 'listo':
+        return jsonify(_trabajo_json(trabajo)), 409
+    ruta = os.path.join(_carpeta_reportes(), trabajo['archivo'])
+    if not os.path.exists(ruta):
+        # La tabla cambió y el PDF de esa versión ya se reemplazó
+        abort(410)
+    return send_file(ruta, as_attachment=True, download_name=f"{trabajo['reporte']}.pdf",
+                     mimetype='application/pdf')
+
+
+# ---------- Descarga directa ----------
+@bp.route('/productos')
+@login_required
+def productos_pdf():
+    return _servir_reporte('productos')
 
 @bp.route('/clientes')
 @login_required
 def clientes_pdf():
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-
-    styles = getSampleStyleSheet()
-    title = Paragraph("Listado de Clientes", styles['Title'])
-    elements.append(title)
-    elements.append(Spacer(1, 12))
-
-    clientes = get_clientes()
-    data = [['ID', 'Nombre', 'Cédula', 'Email', 'Teléfono']]
-    for c in clientes:
-        data.append([str(c.id), c.nombre, c.cedula or '-', c.email or '-', c.telefono or '-'])
-
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.grey),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0,0), (-1,0), 12),
-        ('BACKGROUND', (0,1), (-1,-1), colors.beige),
-        ('GRID', (0,0), (-1,-1), 1, colors.black)
-    ]))
-    elements.append(table)
-
-    doc.build(elements)
-    buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name='clientes.pdf', mimetype='application/pdf')
+    return _servir_reporte('clientes')
 
 @bp.route('/usuarios')
 @login_required
 def usuarios_pdf():
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-
-    styles = getSampleStyleSheet()
-    title = Paragraph("Listado de Usuarios", styles['Title'])
-    elements.append(title)
-    elements.append(Spacer(1, 12))
-
-    usuarios = get_usuarios()
-    data = [['ID', 'Nombre', 'Email', 'Teléfono', 'Rol']]
-    for u in usuarios:
-        data.append([str(u.id), u.nombre, u.mail, u.telefono or '-', u.rol])
-
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.grey),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0,0), (-1,0), 12),
-        ('BACKGROUND', (0,1), (-1,-1), colors.beige),
-        ('GRID', (0,0), (-1,-1), 1, colors.black)
-    ]))
-    elements.append(table)
+    return _servir_reporte('usuarios')
 
-    doc.build(elements)
+
+# ---------- Exportaciones CSV / NDJSON ----------
+def _valor_exportable(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def _filas_exportacion(entidad):
+    modelo, columnas = EXPORTACIONES[entidad]
+    stmt = select(*[getattr(modelo, c) for c in columnas]).order_by(modelo.id)
+    # yield_per activa un cursor del lado del servidor (stream_results)
+    resultado = db.session.execute(stmt.execution_options(yield_per=FILAS_POR_FRAGMENTO))
+    for fila in resultado:
+        yield [_valor_exportable(v) for v in fila]
+
+
+def _generar_csv(entidad):
+    _, columnas = EXPORTACIONES[entidad]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columnas)
+    yield buffer.getvalue()
     buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name='usuarios.pdf', mimetype='application/pdf')
\ No newline at end of file
+    buffer.truncate()
+    for i, fila in enumerate(_filas_exportacion(entidad), 1):
+        writer.writerow(fila)
+        if i % FILAS_POR_FRAGMENTO == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _generar_ndjson(entidad):
+    _, columnas = EXPORTACIONES[entidad]
+    fragmento = []
+    for fila in _filas_exportacion(entidad):
+        fragmento.append(json.dumps(dict(zip(columnas, fila)), ensure_ascii=False, separators=(',', ':')))
+        if len(fragmento) >= FILAS_POR_FRAGMENTO:
+            yield '\n'.join(fragmento) + '\n'
+            fragmento = []
+    if fragmento:
+        yield '\n'.join(fragmento) + '\n'
+
+
+@bp.route('/<entidad>.<formato>')
+@admin_required
+def exportar(entidad, formato):
+    if entidad not in EXPORTACIONES or formato not in FORMATOS_EXPORTACION:
+        abort(404)
+    generador = _generar_csv(entidad) if formato == 'csv' else _generar_ndjson(entidad)
+    return Response(
+        stream_with_context(generador),
+        mimetype=FORMATOS_EXPORTACION[formato],
+        headers={'Content-Disposition': f'attachment; filename={entidad}.{formato}'},
+    )
+
+
+# ---------- Panel de ventas ----------
+@bp.route('/ventas')
+@admin_required
+def ventas():
+    desde, hasta = ventas_service.rango_por_defecto()
+    try:
+        if request.args.get('desde'):
+            desde = datetime.strptime(request.args['desde'], '%Y-%m-%d').date()
+        if request.args.get('hasta'):
+            hasta = datetime.strptime(request.args['hasta'], '%Y-%m-%d').date()
+    except ValueError:
+        abort(400)
+    resumen = ventas_service.resumen(desde, hasta)
+    return render_template('reportes/ventas.html', titulo='Ventas', resumen=resumen,
+                           desde=desde.isoformat(), hasta=hasta.isoformat())
@@ -0,0 +1,64 @@
+import re
+from sqlalchemy import select
+from sqlalchemy.dialects.mysql import match
+from models import Cliente
+from extensions import db
+
+# Búsqueda de clientes para /clientes?q= apoyada siempre en índices:
+#   - solo dígitos  -> prefijo de cédula y teléfono (índices B-tree)
+#   - contiene "@"  -> prefijo de email (índice único)
+#   - texto         -> FULLTEXT (nombre, email) en MySQL; prefijo de nombre
+#                      en otros motores o si ningún término llega al mínimo
+# Devuelve ids ordenados por relevancia, como mucho LIMITE.
+LIMITE = 50
+# innodb_ft_min_token_size por defecto: términos más cortos no están indexados
+MIN_TERMINO_FULLTEXT = 3
+
+def _rango_prefijo(columna, valor):
+    # "col >= 'abc' AND col < 'abd'" equivale a LIKE 'abc%' y siempre es un
+    # rango sobre el índice (con la collation de MySQL, sin distinguir mayúsculas)
+    siguiente = valor[:-1] + chr(ord(valor[-1]) + 1)
+    return columna >= valor, columna < siguiente
+
+def _por_prefijo(valor, columnas, limite):
+    """Une las coincidencias por prefijo de cada columna (una consulta por índice)."""
+    candidatos = {}
+    for columna in columnas:
+        filas = db.session.execute(
+            select(Cliente.id, columna)
+            .where(*_rango_prefijo(columna, valor))
+            .order_by(columna)
+            .limit(limite)
+        ).all()
+        for cliente_id, texto in filas:
+            # Primero coincidencias exactas, luego los valores más cortos
+            rango = (texto.lower() != valor.lower(), len(texto), texto.lower())
+            if cliente_id not in candidatos or rango < candidatos[cliente_id]:
+                candidatos[cliente_id] = rango
+    return sorted(candidatos, key=candidatos.get)[:limite]
+
+def _fulltext(terminos, limite):
+    # Modo booleano: todos los términos obligatorios y con comodín de prefijo
+    consulta = " ".join(f"+{t}*" for t in terminos)
+    relevancia = match(Cliente.nombre, Cliente.email, against=consulta).in_boolean_mode()
+    return list(db.session.scalars(
+        select(Cliente.id)
+        .where(relevancia > 0)
+        .order_by(relevancia.desc(), Cliente.nombre)
+        .limit(limite)
+    ))
+
+def buscar(q, limite=LIMITE):
+    q = (q or "").strip()
+    if not q:
+        return []
+    digitos = re.sub(r"[\s\-]", "", q)
+    if digitos.isdigit():
+        return _por_prefijo(digitos, [Cliente.cedula, Cliente.telefono], limite)
+    if "@" in q:
+        return _por_prefijo(q.lower(), [Cliente.email], limite)
+
+    terminos = [t for t in re.findall(r"\w+", q.lower()) if len(t) >= MIN_TERMINO_FULLTEXT]
+    if terminos and db.session.get_bind().dialect.name == "mysql":
+        return _fulltext(terminos, limite)
+    return _por_prefijo(q, [Cliente.nombre, Cliente.email], limite)
@@ -0,0 +1,61 @@
+import threading
+import time
+from flask import current_app
+from models import Producto
+
+# Caché en memoria del catálogo (menú) compartida por los blueprints.
+# Se invalida explícitamente cuando cambia la tabla de productos y,
+# como respaldo, expira tras CATALOGO_CACHE_TTL segundos.
+DEFAULT_TTL = 60
+
+_lock = threading.Lock()
+_menu = None
+_expira = 0.0
+_generacion = 0
+_hits = 0
+_misses = 0
+
+def _cargar_menu():
+    productos = Producto.query.order_by(Producto.id.desc()).all()
+    menu = {}
+    for p in productos:
+        menu[p.slug] = {
+            "id": p.id,
+            "nombre": p.nombre,
+            "precio": p.precio,
+            "stock": p.stock,
+            "img": p.img or "",
+            "desc": p.descripcion or "",
+        }
+    return menu
+
+def get_menu():
+    """Devuelve el menú {slug: datos}; solo consulta la BD si la caché expiró."""
+    global _menu, _expira, _hits, _misses
+    ahora = time.monotonic()
+    with _lock:
+        if _menu is not None and ahora < _expira:
+            _hits += 1
+            return _menu
+        _misses += 1
+        generacion = _generacion
+    menu = _cargar_menu()
+    ttl = current_app.config.get("CATALOGO_CACHE_TTL", DEFAULT_TTL)
+    with _lock:
+        # Si hubo una invalidación mientras se consultaba, no se guarda el resultado
+        if generacion == _generacion:
+            _menu = menu
+            _expira = ahora + ttl
+    return menu
+
+def invalidate():
+    """Descarta el menú en caché; llamar tras cualquier escritura en productos."""
+    global _menu, _expira, _generacion
+    with _lock:
+        _menu = None
+        _expira = 0.0
+        _generacion += 1
+
+def stats():
+    with _lock:
+        return {"hits": _hits, "misses": _misses, "cacheado": _menu is not None}
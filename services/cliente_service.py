@@ -1,15 +1,21 @@
-from models import Cliente
+from models import Cliente, Usuario
 from extensions import db
+from services import versiones, sesion_cache
 
 def get_all():
     return Cliente.query.order_by(Cliente.nombre).all()
 
+def iter_all(tamano_lote=500):
+    """Recorre todos los registros por lotes (yield_per) sin cargarlos de golpe."""
+    return Cliente.query.order_by(Cliente.nombre, Cliente.id).yield_per(tamano_lote)
+
 def get_by_id(id):
     return Cliente.query.get_or_404(id)
 
 def create(data):
     cliente = Cliente(**data)
     db.session.add(cliente)
+    versiones.incrementar("clientes")
     db.session.commit()
     return cliente
 
@@ -17,6 +23,7 @@ def update(id, data):
     cliente = get_by_id(id)
     for key, value in data.items():
         setattr(cliente, key, value)
+    versiones.incrementar("clientes")
     db.session.commit()
     return cliente
 
@@ -24,5 +31,9 @@ def delete(id):
     cliente = get_by_id(id)
     if cliente.pedidos:
         raise ValueError("No se puede eliminar porque tiene pedidos asociados")
+    # Los usuarios vinculados quedan sin cliente (equivale a ON DELETE SET NULL)
+    Usuario.query.filter_by(cliente_id=id).update({"cliente_id": None})
     db.session.delete(cliente)
-    db.session.commit()
\ No newline at end of file
+    versiones.incrementar("clientes")
+    db.session.commit()
+    sesion_cache.invalidar_todo()
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, or_, select
+from models import Pedido, PedidoItem, PedidoCambio, Producto
+from extensions import db
+
+# Cola de cocina: pedidos "En preparación" en orden de llegada, leídos por el
+# índice (estado, id) con una proyección compacta. Cada alta o cambio de
+# estado deja una fila en pedido_cambios dentro de la misma transacción; su
+# id es el cursor con el que las pantallas piden solo lo que cambió.
+ESTADO_COLA = "En preparación"
+LIMITE_COLA = 200
+# Los ids autoincrementales se asignan al insertar pero se ven al confirmar:
+# se releen los cambios de hasta MARGEN_CAMBIOS ids antes del cursor que sean
+# de los últimos VENTANA_RELECTURA, para no perder uno que confirmó tarde.
+# Las respuestas son idempotentes, así que repetir no afecta.
+MARGEN_CAMBIOS = 50
+VENTANA_RELECTURA = timedelta(seconds=5)
+RETENCION_CAMBIOS = timedelta(days=1)
+
+def registrar_cambio(pedido_ids, estado):
+    """Anota en pedido_cambios; llamar dentro de la transacción del cambio."""
+    ahora = datetime.now().replace(microsecond=0)
+    db.session.execute(insert(PedidoCambio), [
+        {"pedido_id": pedido_id, "estado": estado, "fecha": ahora} for pedido_id in pedido_ids
+    ])
+
+def _cursor_actual():
+    return db.session.scalar(select(func.max(PedidoCambio.id))) or 0
+
+def _proyectar(pedido_ids):
+    """{id, fecha, notas, items: [{producto, cantidad}]} con dos consultas."""
+    if not pedido_ids:
+        return []
+    pedidos = db.session.execute(
+        select(Pedido.id, Pedido.fecha, Pedido.notas)
+        .where(Pedido.id.in_(pedido_ids))
+        .order_by(Pedido.id)
+    ).all()
+    items = {}
+    for pedido_id, nombre, cantidad in db.session.execute(
+        select(PedidoItem.pedido_id, Producto.nombre, PedidoItem.cantidad)
+        .join(Producto, Producto.id == PedidoItem.producto_id)
+        .where(PedidoItem.pedido_id.in_(pedido_ids))
+        .order_by(PedidoItem.id)
+    ):
+        items.setdefault(pedido_id, []).append({"producto": nombre, "cantidad": cantidad})
+    return [
+        {"id": p.id, "fecha": p.fecha.isoformat(), "notas": p.notas or "", "items": items.get(p.id, [])}
+        for p in pedidos
+    ]
+
+def cola(limite=LIMITE_COLA):
+    """Foto completa de la cola y el cursor desde el que pedir cambios."""
+    cursor = _cursor_actual()
+    ids = list(db.session.scalars(
+        select(Pedido.id).where(Pedido.estado == ESTADO_COLA).order_by(Pedido.id).limit(limite)
+    ))
+    return {"completo": True, "pedidos": _proyectar(ids), "salen": [], "cursor": cursor}
+
+def cambios_desde(cursor, limite=LIMITE_COLA):
+    """Pedidos que entraron (o siguen) en la cola y los que salieron desde cursor.
+
+    Si el cursor es anterior a los cambios conservados, devuelve la cola completa.
+    """
+    minimo = db.session.scalar(select(func.min(PedidoCambio.id)))
+    if minimo is not None and cursor < minimo - 1:
+        return cola(limite)
+    nuevo_cursor = _cursor_actual()
+    cambiados = list(db.session.scalars(
+        select(PedidoCambio.pedido_id)
+        .where(
+            PedidoCambio.id > cursor - MARGEN_CAMBIOS,
+            or_(PedidoCambio.id > cursor, PedidoCambio.fecha >= datetime.now() - VENTANA_RELECTURA),
+        )
+        .distinct()
+    ))
+    if not cambiados:
+        return {"completo": False, "pedidos": [], "salen": [], "cursor": max(nuevo_cursor, cursor)}
+    # El estado actual decide: en la cola se envía proyectado, si no, solo el id
+    actuales = dict(db.session.execute(
+        select(Pedido.id, Pedido.estado).where(Pedido.id.in_(cambiados))
+    ).all())
+    en_cola = sorted(i for i, estado in actuales.items() if estado == ESTADO_COLA)[:limite]
+    salen = sorted(i for i in cambiados if actuales.get(i) != ESTADO_COLA)
+    return {"completo": False, "pedidos": _proyectar(en_cola), "salen": salen, "cursor": nuevo_cursor}
+
+def podar_cambios(retencion=RETENCION_CAMBIOS):
+    """Borra los cambios más antiguos que la retención; devuelve cuántos."""
+    limite = datetime.now() - retencion
+    resultado = db.session.execute(delete(PedidoCambio).where(PedidoCambio.fecha < limite))
+    db.session.commit()
+    return resultado.rowcount
@@ -0,0 +1,210 @@
+import csv
+import io
+import json
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se serializa dentro del proceso
+    fcntl = None
+
+# Almacenamiento de /datos: registros en JSON Lines de solo-anexado más un
+# índice compacto con el offset (8 bytes) de cada línea, para contar y
+# paginar sin leer el archivo completo.
+# Las lecturas no toman ningún lock: el escritor anexa (y sincroniza) la línea
+# antes que su offset, así que todo offset del índice apunta a una línea
+# completa. Solo preparar() (una vez por proceso) y agregar() bloquean.
+CAMPOS = ["nombre", "cedula", "email", "telefono"]
+_OFFSET = struct.Struct("<Q")
+_lock = threading.Lock()
+_preparados = set()
+
+def _rutas(data_dir):
+    return (os.path.join(data_dir, "datos.jsonl"),
+            os.path.join(data_dir, "datos.idx"),
+            os.path.join(data_dir, "datos.lock"))
+
+@contextmanager
+def _bloqueo(data_dir):
+    """Exclusión mutua entre hilos y, donde hay fcntl, entre procesos."""
+    _, _, ruta_lock = _rutas(data_dir)
+    with _lock:
+        with open(ruta_lock, "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+def _leer_json_legado(ruta):
+    with open(ruta, "r", encoding="utf-8") as f:
+        registros = json.load(f)
+    return [r for r in registros if isinstance(r, dict)] if isinstance(registros, list) else []
+
+def _leer_csv_legado(ruta):
+    with open(ruta, "r", encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+def _leer_txt_legado(ruta):
+    registros = []
+    with open(ruta, "r", encoding="utf-8") as f:
+        for linea in f:
+            partes = linea.strip().split(",")
+            if len(partes) == len(CAMPOS):
+                registros.append(dict(zip(CAMPOS, partes)))
+    return registros
+
+# El formato anterior escribía cada registro en los tres archivos a la vez;
+# se migra el más completo (un datos.json dañado se reiniciaba vacío mientras
+# que el TXT y el CSV seguían creciendo). A igualdad, en este orden de fidelidad.
+LEGADO = [("datos.json", _leer_json_legado), ("datos.csv", _leer_csv_legado), ("datos.txt", _leer_txt_legado)]
+
+def _migrar_legado(data_dir):
+    """Importa una sola vez los datos.json/.csv/.txt antiguos al formato JSON Lines."""
+    ruta_jsonl, ruta_idx, _ = _rutas(data_dir)
+    if os.path.exists(ruta_jsonl):
+        return
+    registros = []
+    for nombre, leer in LEGADO:
+        ruta = os.path.join(data_dir, nombre)
+        if not os.path.exists(ruta):
+            continue
+        try:
+            candidatos = leer(ruta)
+        except (ValueError, OSError, csv.Error):
+            continue
+        if len(candidatos) > len(registros):
+            registros = candidatos
+    if not registros:
+        return
+    tmp_jsonl, tmp_idx = ruta_jsonl + ".tmp", ruta_idx + ".tmp"
+    with open(tmp_jsonl, "wb") as fj, open(tmp_idx, "wb") as fi:
+        for r in registros:
+            fi.write(_OFFSET.pack(fj.tell()))
+            fj.write(_serializar(r))
+    # Primero los datos: si el proceso muere antes del índice, _sincronizar_indice lo rehace
+    os.replace(tmp_jsonl, ruta_jsonl)
+    os.replace(tmp_idx, ruta_idx)
+
+def _serializar(registro):
+    limpio = {c: registro.get(c) or "" for c in CAMPOS}
+    return (json.dumps(limpio, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+def _sincronizar_indice(ruta_jsonl, ruta_idx):
+    """Completa el índice si quedó atrás del archivo de datos (p. ej. tras un corte)."""
+    tam_datos = os.path.getsize(ruta_jsonl) if os.path.exists(ruta_jsonl) else 0
+    tam_idx = os.path.getsize(ruta_idx) if os.path.exists(ruta_idx) else 0
+    tam_idx -= tam_idx % _OFFSET.size
+    with open(ruta_jsonl, "ab+") as fj, open(ruta_idx, "ab+") as fi:
+        fi.truncate(tam_idx)
+        if tam_idx:
+            fi.seek(tam_idx - _OFFSET.size)
+            (inicio,) = _OFFSET.unpack(fi.read(_OFFSET.size))
+            fj.seek(inicio)
+            fj.readline()
+            pos = fj.tell()
+        else:
+            pos = 0
+        if pos >= tam_datos:
+            return
+        fj.seek(pos)
+        nuevos = []
+        while True:
+            linea = fj.readline()
+            if not linea.endswith(b"\n"):
+                break
+            nuevos.append(_OFFSET.pack(pos))
+            pos += len(linea)
+        # Una línea final incompleta (escritura interrumpida) se descarta
+        fj.truncate(pos)
+        fi.seek(0, os.SEEK_END)
+        fi.write(b"".join(nuevos))
+
+def preparar(data_dir):
+    """Crea la carpeta, migra el formato antiguo y repara el índice; una vez por proceso."""
+    if data_dir in _preparados:
+        return
+    os.makedirs(data_dir, exist_ok=True)
+    with _bloqueo(data_dir):
+        _migrar_legado(data_dir)
+        _sincronizar_indice(*_rutas(data_dir)[:2])
+    _preparados.add(data_dir)
+
+def agregar(data_dir, registro):
+    """Anexa un registro: una línea al JSONL y su offset al índice, con fsync."""
+    ruta_jsonl, ruta_idx, _ = _rutas(data_dir)
+    linea = _serializar(registro)
+    with _bloqueo(data_dir):
+        _sincronizar_indice(ruta_jsonl, ruta_idx)
+        with open(ruta_jsonl, "ab") as fj:
+            offset = fj.tell()
+            fj.write(linea)
+            fj.flush()
+            os.fsync(fj.fileno())
+        with open(ruta_idx, "ab") as fi:
+            fi.write(_OFFSET.pack(offset))
+            fi.flush()
+            os.fsync(fi.fileno())
+
+def contar(data_dir):
+    _, ruta_idx, _ = _rutas(data_dir)
+    if not os.path.exists(ruta_idx):
+        return 0
+    return os.path.getsize(ruta_idx) // _OFFSET.size
+
+def leer_pagina(data_dir, pagina=1, por_pagina=20):
+    """Registros de una página, del más reciente al más antiguo."""
+    ruta_jsonl, ruta_idx, _ = _rutas(data_dir)
+    total = contar(data_dir)
+    fin = total - (pagina - 1) * por_pagina
+    inicio = max(fin - por_pagina, 0)
+    if fin <= 0:
+        return []
+    with open(ruta_idx, "rb") as fi:
+        fi.seek(inicio * _OFFSET.size)
+        crudo = fi.read((fin - inicio) * _OFFSET.size)
+    offsets = [o for (o,) in _OFFSET.iter_unpack(crudo)]
+    registros = []
+    with open(ruta_jsonl, "rb") as fj:
+        for offset in reversed(offsets):
+            fj.seek(offset)
+            registros.append(json.loads(fj.readline()))
+    return registros
+
+def _iterar(data_dir):
+    ruta_jsonl, _, _ = _rutas(data_dir)
+    if not os.path.exists(ruta_jsonl):
+        return
+    with open(ruta_jsonl, "rb") as fj:
+        for linea in fj:
+            if linea.endswith(b"\n"):
+                yield json.loads(linea)
+
+def exportar(data_dir, formato):
+    """Genera el contenido de la exportación (txt, csv o json) por fragmentos."""
+    if formato == "txt":
+        for r in _iterar(data_dir):
+            yield ",".join(r.get(c, "") for c in CAMPOS) + "\n"
+    elif formato == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CAMPOS)
+        for r in _iterar(data_dir):
+            writer.writerow([r.get(c, "") for c in CAMPOS])
+            if buffer.tell() > 8192:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    elif formato == "json":
+        yield "["
+        for i, r in enumerate(_iterar(data_dir)):
+            yield ("," if i else "") + "\n    " + json.dumps(r, ensure_ascii=False)
+        yield "\n]\n"
+    else:
+        raise ValueError(f"Formato no soportado: {formato}")
@@ -0,0 +1,183 @@
+import importlib
+import json
+import os
+import queue
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se serializa dentro del proceso
+    fcntl = None
+
+# Pub/sub de eventos de pedidos para el stream SSE.
+# El hub reparte cada evento a las colas de los suscriptores del proceso.
+# Los eventos llegan al hub a través de un backend intercambiable
+# (EVENTOS_BACKEND):
+#   - "local":   el evento se reparte solo en este proceso (desarrollo, un worker).
+#   - "archivo": se anexa a un JSONL en un directorio compartido y un hilo por
+#                worker lo sigue, de modo que llega a todos los workers de la máquina.
+#   - "paquete.modulo:Clase": backend propio (p. ej. Redis) con la misma interfaz.
+MAX_PENDIENTES = 100
+
+
+class Suscripcion(queue.Queue):
+    """Cola de un suscriptor; cerrada=True si el hub la descartó por no consumir."""
+    cerrada = False
+
+
+class Hub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscriptores = set()
+
+    def suscribir(self):
+        cola = Suscripcion(maxsize=MAX_PENDIENTES)
+        with self._lock:
+            self._suscriptores.add(cola)
+        return cola
+
+    def cancelar(self, cola):
+        with self._lock:
+            self._suscriptores.discard(cola)
+
+    def difundir(self, evento):
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        for cola in suscriptores:
+            try:
+                cola.put_nowait(evento)
+            except queue.Full:
+                # Cliente que no consume: se le descarta en vez de frenar al resto.
+                # Su stream termina y el navegador reconecta y se resincroniza.
+                cola.cerrada = True
+                self.cancelar(cola)
+
+    def conectados(self):
+        with self._lock:
+            return len(self._suscriptores)
+
+
+class BackendLocal:
+    """Entrega directa al hub del proceso actual."""
+
+    def iniciar(self, app, entregar):
+        self._entregar = entregar
+
+    def escuchar(self):
+        pass
+
+    def publicar(self, evento):
+        self._entregar(evento)
+
+
+class BackendArchivo:
+    """Eventos compartidos entre workers mediante un JSONL de solo-anexado.
+
+    Cada proceso sigue el archivo desde un hilo. Al superar EVENTOS_MAX_BYTES
+    el escritor lo rota (renombra a .1), y los lectores terminan el archivo
+    viejo antes de pasar al nuevo.
+    """
+
+    def iniciar(self, app, entregar):
+        directorio = app.config.get("EVENTOS_DIR") or os.path.join(app.instance_path, "eventos")
+        os.makedirs(directorio, exist_ok=True)
+        self._ruta = os.path.join(directorio, "eventos.jsonl")
+        self._ruta_lock = os.path.join(directorio, "eventos.lock")
+        self._max_bytes = app.config.get("EVENTOS_MAX_BYTES", 1024 * 1024)
+        self._intervalo = app.config.get("EVENTOS_INTERVALO", 0.25)
+        self._entregar = entregar
+        self._lock = threading.Lock()
+        self._hilo = None
+        open(self._ruta, "ab").close()
+
+    def escuchar(self):
+        # El hilo lector se arranca con el primer suscriptor del proceso, así
+        # funciona también con gunicorn --preload (los hilos no sobreviven al fork)
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._seguir, name="eventos-archivo", daemon=True)
+                self._hilo.start()
+
+    def publicar(self, evento):
+        linea = (json.dumps(evento, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock, open(self._ruta_lock, "a") as bloqueo:
+            if fcntl:
+                fcntl.flock(bloqueo, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(self._ruta) and os.path.getsize(self._ruta) > self._max_bytes:
+                    os.replace(self._ruta, self._ruta + ".1")
+                with open(self._ruta, "ab") as f:
+                    f.write(linea)
+            finally:
+                if fcntl:
+                    fcntl.flock(bloqueo, fcntl.LOCK_UN)
+
+    def _seguir(self):
+        f = open(self._ruta, "rb")
+        f.seek(0, os.SEEK_END)  # solo interesan los eventos nuevos
+        pendiente = b""
+        while True:
+            bloque = f.read()
+            if bloque:
+                pendiente = self._procesar(pendiente + bloque)
+                continue
+            # Sin datos nuevos: ¿se rotó el archivo?
+            try:
+                rotado = os.stat(self._ruta).st_ino != os.fstat(f.fileno()).st_ino
+            except FileNotFoundError:
+                rotado = False
+            if rotado:
+                # Lo que quedó en el archivo viejo antes de abrir el nuevo
+                self._procesar(pendiente + f.read())
+                f.close()
+                f = open(self._ruta, "rb")
+                pendiente = b""
+                continue
+            time.sleep(self._intervalo)
+
+    def _procesar(self, datos):
+        *lineas, resto = datos.split(b"\n")
+        for linea in lineas:
+            try:
+                self._entregar(json.loads(linea))
+            except ValueError:
+                continue
+        return resto
+
+
+BACKENDS = {"local": BackendLocal, "archivo": BackendArchivo}
+
+hub = Hub()
+_backend = None
+
+
+def _crear_backend(nombre):
+    if nombre in BACKENDS:
+        return BACKENDS[nombre]()
+    modulo, _, clase = nombre.partition(":")
+    return getattr(importlib.import_module(modulo), clase)()
+
+
+def init_app(app):
+    global _backend
+    _backend = _crear_backend(app.config.get("EVENTOS_BACKEND", "local"))
+    _backend.iniciar(app, hub.difundir)
+
+
+def suscribir():
+    """Cola con los eventos que lleguen a partir de ahora; liberar con cancelar()."""
+    _backend.escuchar()
+    return hub.suscribir()
+
+
+def cancelar(cola):
+    hub.cancelar(cola)
+
+
+def publicar(tipo, **datos):
+    """Publica un evento; llamar después del commit que lo origina."""
+    if _backend is None:
+        return
+    evento = {"tipo": tipo, "ts": round(time.time(), 3), **datos}
+    _backend.publicar(evento)
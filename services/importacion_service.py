@@ -0,0 +1,234 @@
+import csv
+import io
+import json
+import math
+from sqlalchemy import insert, select, or_
+from sqlalchemy.exc import SQLAlchemyError
+from models import Producto, Cliente
+from extensions import db
+from services import catalogo_cache, versiones
+from validaciones import validar_nombre, validar_cedula, validar_telefono
+
+# Importación masiva: el archivo se lee como flujo, las filas se validan por
+# lotes, la unicidad se comprueba con una consulta IN por lote y las filas
+# válidas se insertan con executemany.
+TAMANO_LOTE = 1000
+MAX_ERRORES = 50
+FORMATOS = ("csv", "json", "jsonl")
+
+def formato_de(nombre_archivo):
+    extension = (nombre_archivo or "").rsplit(".", 1)[-1].lower()
+    if extension == "ndjson":
+        return "jsonl"
+    return extension if extension in FORMATOS else None
+
+def _leer_array_json(texto, tamano_bloque=65536):
+    """Recorre un array JSON [{...}, {...}] objeto a objeto sin cargarlo entero."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    inicio = False
+    fin = False
+    while not fin:
+        bloque = texto.read(tamano_bloque)
+        buffer += bloque
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not inicio:
+                if buffer[pos] != "[":
+                    raise ValueError("El archivo JSON debe contener un arreglo de objetos.")
+                inicio = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                fin = True
+                break
+            try:
+                objeto, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if not bloque:
+                    raise ValueError("JSON incompleto o mal formado.")
+                break  # objeto partido entre bloques: leer más
+            yield objeto
+        buffer = buffer[pos:]
+        if not bloque:
+            break
+
+def leer_registros(flujo, formato):
+    """Genera dicts desde un flujo binario CSV, JSON (arreglo) o JSON Lines."""
+    texto = io.TextIOWrapper(flujo, encoding="utf-8-sig", newline="")
+    if formato == "csv":
+        yield from csv.DictReader(texto)
+    elif formato == "jsonl":
+        for linea in texto:
+            if linea.strip():
+                yield json.loads(linea)
+    elif formato == "json":
+        yield from _leer_array_json(texto)
+    else:
+        raise ValueError("Formato no soportado. Usa CSV, JSON o JSON Lines.")
+
+def _lotes(registros, tamano):
+    lote = []
+    for i, registro in enumerate(registros, 1):
+        lote.append((i, registro))
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def _texto(registro, campo):
+    valor = registro.get(campo)
+    return str(valor).strip() if valor is not None else ""
+
+def _validar_producto(r):
+    slug = _texto(r, "slug").lower()
+    nombre = _texto(r, "nombre")
+    if not slug or not nombre:
+        raise ValueError("slug y nombre son obligatorios")
+    if len(slug) > 100 or len(nombre) > 200:
+        raise ValueError("slug o nombre demasiado largo")
+    try:
+        precio = float(_texto(r, "precio").replace(",", "."))
+        stock = int(_texto(r, "stock") or 0)
+    except ValueError:
+        raise ValueError("precio o stock no numérico")
+    if not math.isfinite(precio):
+        raise ValueError("precio no numérico")
+    if precio < 0 or stock < 0:
+        raise ValueError("precio y stock no pueden ser negativos")
+    return {
+        "slug": slug,
+        "nombre": nombre,
+        "precio": precio,
+        "stock": stock,
+        "img": _texto(r, "img")[:500],
+        "descripcion": _texto(r, "descripcion"),
+    }
+
+def _validar_cliente(r):
+    nombre = _texto(r, "nombre")
+    cedula = _texto(r, "cedula") or None
+    email = _texto(r, "email").lower() or None
+    telefono = _texto(r, "telefono") or None
+    if not nombre or not validar_nombre(nombre):
+        raise ValueError("el nombre solo puede contener letras y espacios")
+    if cedula and not validar_cedula(cedula):
+        raise ValueError("la cédula debe tener 10 dígitos numéricos")
+    if telefono and not validar_telefono(telefono):
+        raise ValueError("el teléfono debe comenzar con 09 y tener 10 dígitos")
+    if email and ("@" not in email or len(email) > 120):
+        raise ValueError("email inválido")
+    return {"nombre": nombre[:200], "cedula": cedula, "email": email, "telefono": telefono}
+
+def _importar(registros, validar, claves, consultar_existentes, modelo, tamano_lote):
+    """Valida e inserta por lotes; cada lote se confirma por separado.
+
+    Si la lectura del archivo o la inserción de un lote fallan, la importación
+    se detiene sin lanzar la excepción: los lotes anteriores quedan guardados
+    y resultado["detenido"] explica dónde y por qué se paró.
+    """
+    resultado = {"leidos": 0, "insertados": 0, "rechazados": 0, "errores": [], "detenido": None}
+    vistos = {clave: set() for clave in claves}
+
+    def rechazar(fila, motivo):
+        resultado["rechazados"] += 1
+        if len(resultado["errores"]) < MAX_ERRORES:
+            resultado["errores"].append(f"Fila {fila}: {motivo}")
+
+    leidas = 0
+
+    def contar_filas():
+        nonlocal leidas
+        for registro in registros:
+            leidas += 1
+            yield registro
+
+    lotes = _lotes(contar_filas(), tamano_lote)
+    while True:
+        try:
+            lote = next(lotes, None)
+        except (ValueError, csv.Error) as e:
+            # Las filas ya leídas del lote en curso tampoco se guardan
+            resultado["detenido"] = f"error de lectura en la fila {leidas + 1}: {e}"
+            break
+        if lote is None:
+            break
+        resultado["leidos"] += len(lote)
+        validos = []
+        for fila, registro in lote:
+            if not isinstance(registro, dict):
+                rechazar(fila, "no es un objeto con columnas")
+                continue
+            try:
+                validos.append((fila, validar(registro)))
+            except ValueError as e:
+                rechazar(fila, e)
+
+        # Una sola consulta por lote para conocer los valores ya registrados
+        existentes = consultar_existentes(
+            {clave: {d[clave] for _, d in validos if d[clave]} for clave in claves}
+        )
+        filas = []
+        for fila, datos in validos:
+            duplicada = next(
+                (clave for clave in claves
+                 if datos[clave] and (datos[clave] in existentes[clave] or datos[clave] in vistos[clave])),
+                None,
+            )
+            if duplicada:
+                rechazar(fila, f"{duplicada} '{datos[duplicada]}' ya existe")
+                continue
+            for clave in claves:
+                if datos[clave]:
+                    vistos[clave].add(datos[clave])
+            filas.append(datos)
+
+        if filas:
+            try:
+                db.session.execute(insert(modelo), filas)
+                versiones.incrementar(modelo.__tablename__)
+                db.session.commit()
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                resultado["detenido"] = (f"no se pudo guardar el lote de las filas {lote[0][0]}-{lote[-1][0]}: "
+                                         f"{getattr(e, 'orig', None) or e}")
+                break
+            resultado["insertados"] += len(filas)
+    return resultado
+
+def _productos_existentes(valores):
+    slugs = valores["slug"]
+    encontrados = set()
+    if slugs:
+        encontrados = set(db.session.scalars(select(Producto.slug).where(Producto.slug.in_(slugs))))
+    return {"slug": encontrados}
+
+def _clientes_existentes(valores):
+    cedulas, emails = valores["cedula"], valores["email"]
+    encontrados = {"cedula": set(), "email": set()}
+    condiciones = []
+    if cedulas:
+        condiciones.append(Cliente.cedula.in_(cedulas))
+    if emails:
+        condiciones.append(Cliente.email.in_(emails))
+    if condiciones:
+        for cedula, email in db.session.execute(select(Cliente.cedula, Cliente.email).where(or_(*condiciones))):
+            if cedula:
+                encontrados["cedula"].add(cedula)
+            if email:
+                encontrados["email"].add(email.lower())
+    return encontrados
+
+def importar_productos(registros, tamano_lote=TAMANO_LOTE):
+    resultado = _importar(registros, _validar_producto, ["slug"], _productos_existentes, Producto, tamano_lote)
+    if resultado["insertados"]:
+        catalogo_cache.invalidate()
+    return resultado
+
+def importar_clientes(registros, tamano_lote=TAMANO_LOTE):
+    return _importar(registros, _validar_cliente, ["cedula", "email"], _clientes_existentes, Cliente, tamano_lote)
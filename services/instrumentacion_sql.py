@@ -0,0 +1,112 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Instrumentación de SQL: cuenta consultas y tiempo de BD por petición (vía
+# eventos del Engine + hooks de Flask), acumula por endpoint las sentencias
+# más lentas y registra en el log "sql.lento" las que superan SQL_LENTO_MS.
+# Solo usa perf_counter y contadores en memoria, así que puede quedar activa.
+TOP_LENTAS = 5
+MAX_SQL = 300
+
+log_lento = logging.getLogger("sql.lento")
+_lock = threading.Lock()
+_por_endpoint = {}
+_umbral = 0.2
+_instalado = False
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("inicio_consulta", []).append((context, time.perf_counter()))
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    _, inicio = conn.info["inicio_consulta"].pop()
+    _registrar(statement, time.perf_counter() - inicio)
+
+def _error(contexto):
+    # after_cursor_execute no se emite si la sentencia falla: sin esto la pila
+    # crecería con cada error. Solo hay marca si la ejecución llegó al cursor
+    # (un error al compilar la sentencia no pasa por before_cursor_execute).
+    if contexto.connection is None:
+        return
+    pila = contexto.connection.info.get("inicio_consulta")
+    if pila and pila[-1][0] is contexto.execution_context:
+        _, inicio = pila.pop()
+        _registrar(contexto.statement or "", time.perf_counter() - inicio)
+
+def _registrar(statement, duracion):
+    if has_request_context():
+        datos = g.get("_sql")
+        if datos is not None:
+            datos["consultas"] += 1
+            datos["tiempo"] += duracion
+            if duracion > datos["lenta"][0]:
+                datos["lenta"] = (duracion, statement)
+    if duracion >= _umbral:
+        origen = request.endpoint if has_request_context() else "-"
+        log_lento.warning("%.1f ms [%s] %s", duracion * 1000, origen, " ".join(statement.split())[:MAX_SQL])
+
+def _inicio_peticion():
+    g._sql = {"consultas": 0, "tiempo": 0.0, "lenta": (0.0, "")}
+
+def _fin_peticion(response):
+    datos = g.pop("_sql", None)
+    if datos is None:
+        return response
+    response.headers["X-DB-Queries"] = str(datos["consultas"])
+    response.headers.add("Server-Timing", f'db;dur={datos["tiempo"] * 1000:.1f};desc="{datos["consultas"]} consultas"')
+    _acumular(request.endpoint or "-", datos)
+    return response
+
+def _acumular(endpoint, datos):
+    with _lock:
+        total = _por_endpoint.setdefault(endpoint, {"peticiones": 0, "consultas": 0, "tiempo": 0.0, "lentas": []})
+        total["peticiones"] += 1
+        total["consultas"] += datos["consultas"]
+        total["tiempo"] += datos["tiempo"]
+        duracion, statement = datos["lenta"]
+        if statement:
+            entrada = (duracion, " ".join(statement.split())[:MAX_SQL])
+            if len(total["lentas"]) < TOP_LENTAS:
+                heapq.heappush(total["lentas"], entrada)
+            elif entrada > total["lentas"][0]:
+                heapq.heapreplace(total["lentas"], entrada)
+
+def init_app(app):
+    """Activa la instrumentación si SQL_INSTRUMENTACION está habilitado."""
+    global _umbral, _instalado
+    if not app.config.get("SQL_INSTRUMENTACION", True):
+        return
+    _umbral = app.config.get("SQL_LENTO_MS", 200) / 1000
+    if not log_lento.handlers:
+        ruta = app.config.get("SQL_LENTO_LOG") or os.path.join(app.instance_path, "sql_lento.log")
+        manejador = logging.FileHandler(ruta, encoding="utf-8", delay=True)
+        manejador.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        log_lento.addHandler(manejador)
+    if not _instalado:
+        event.listen(Engine, "before_cursor_execute", _antes)
+        event.listen(Engine, "after_cursor_execute", _despues)
+        event.listen(Engine, "handle_error", _error)
+        _instalado = True
+    app.before_request(_inicio_peticion)
+    app.after_request(_fin_peticion)
+
+def estadisticas():
+    """Resumen por endpoint, ordenado por tiempo total de BD."""
+    with _lock:
+        filas = [
+            {
+                "endpoint": endpoint,
+                "peticiones": t["peticiones"],
+                "consultas_media": round(t["consultas"] / t["peticiones"], 2),
+                "db_ms_media": round(t["tiempo"] * 1000 / t["peticiones"], 2),
+                "db_ms_total": round(t["tiempo"] * 1000, 2),
+                "mas_lentas": [{"ms": round(d * 1000, 2), "sql": s} for d, s in sorted(t["lentas"], reverse=True)],
+            }
+            for endpoint, t in _por_endpoint.items()
+        ]
+    return sorted(filas, key=lambda f: f["db_ms_total"], reverse=True)
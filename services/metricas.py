@@ -0,0 +1,252 @@
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from flask import g, request
+
+try:
+    import fcntl
+except ImportError:  # Windows: los archivos de workers terminados no se archivan
+    fcntl = None
+
+# Métricas HTTP por blueprint y endpoint en formato Prometheus.
+# Cada proceso acumula en memoria y vuelca su estado, como mucho una vez por
+# METRICAS_INTERVALO segundos, a <METRICAS_DIR>/<pid>-<token>.json (el token
+# evita que un PID reutilizado pise el archivo de otro worker) y mantiene un
+# flock sobre <pid>-<token>.lock mientras vive. /metrics suma los archivos de
+# todos los workers; los de workers terminados (su lock ya está libre) se
+# incorporan a archivados.json y se borran, así los contadores nunca
+# retroceden y el directorio no crece sin límite.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EXCLUIDOS = {"metricas.metrics", "static"}
+
+_lock = threading.Lock()
+_peticiones = {}   # (blueprint, endpoint, metodo, codigo) -> n
+_errores = {}      # (blueprint, endpoint) -> n
+_latencias = {}    # (blueprint, endpoint) -> [buckets..., +Inf, suma]
+_directorio = None
+_intervalo = 1.0
+_ultimo_volcado = 0.0
+_proceso = None    # (pid, nombre base, descriptor del lock) del proceso actual
+_proceso_lock = threading.Lock()
+ARCHIVADOS = "archivados.json"
+MAX_INCORPORADOS = 1000
+
+def _etiquetas():
+    endpoint = request.endpoint or "sin_ruta"
+    return request.blueprint or "app", endpoint
+
+def _inicio():
+    g._metricas_inicio = time.perf_counter()
+
+def _registrar(codigo):
+    inicio = g.pop("_metricas_inicio", None)
+    if inicio is None or request.endpoint in EXCLUIDOS:
+        return
+    duracion = time.perf_counter() - inicio
+    blueprint, endpoint = _etiquetas()
+    clave = (blueprint, endpoint)
+    with _lock:
+        k = (blueprint, endpoint, request.method, str(codigo))
+        _peticiones[k] = _peticiones.get(k, 0) + 1
+        if codigo >= 500:
+            _errores[clave] = _errores.get(clave, 0) + 1
+        hist = _latencias.get(clave)
+        if hist is None:
+            hist = _latencias[clave] = [0] * (len(BUCKETS) + 1) + [0.0]
+        hist[bisect_left(BUCKETS, duracion)] += 1
+        hist[-1] += duracion
+    _volcar()
+
+def _fin(response):
+    _registrar(response.status_code)
+    return response
+
+def _error(exc):
+    # Solo llega con marca de inicio si after_request no se ejecutó (excepción no manejada)
+    if exc is not None:
+        _registrar(500)
+
+def _nombre_propio():
+    """Nombre base de los archivos de este proceso; se renueva tras un fork."""
+    global _proceso
+    pid = os.getpid()
+    with _proceso_lock:
+        if _proceso is None or _proceso[0] != pid:
+            if _proceso and _proceso[2]:
+                _proceso[2].close()  # copia heredada del padre; su lock sigue siendo del padre
+            nombre = f"{pid}-{uuid.uuid4().hex[:12]}"
+            bloqueo = None
+            if fcntl:
+                # El lock se crea antes que el .json: un .json sin lock es de un proceso muerto
+                bloqueo = open(os.path.join(_directorio, f"{nombre}.lock"), "w")
+                fcntl.flock(bloqueo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            _proceso = (pid, nombre, bloqueo)
+        return _proceso[1]
+
+def _ruta_propia():
+    return os.path.join(_directorio, f"{_nombre_propio()}.json")
+
+def _volcar(forzar=False):
+    global _ultimo_volcado
+    ahora = time.monotonic()
+    if not forzar and ahora - _ultimo_volcado < _intervalo:
+        return
+    _ultimo_volcado = ahora
+    with _lock:
+        if not (_peticiones or _errores or _latencias):
+            return
+        estado = {
+            "peticiones": [[*k, v] for k, v in _peticiones.items()],
+            "errores": [[*k, v] for k, v in _errores.items()],
+            "latencias": [[*k, v] for k, v in _latencias.items()],
+        }
+        _escribir(_ruta_propia(), estado)
+
+def _escribir(ruta, estado):
+    tmp = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(estado, f, separators=(",", ":"))
+    os.replace(tmp, ruta)
+
+def init_app(app):
+    global _directorio, _intervalo
+    _directorio = app.config.get("METRICAS_DIR") or os.path.join(app.instance_path, "metricas")
+    _intervalo = app.config.get("METRICAS_INTERVALO", 1.0)
+    os.makedirs(_directorio, exist_ok=True)
+    atexit.register(_volcar, True)
+    app.before_request(_inicio)
+    app.after_request(_fin)
+    app.teardown_request(_error)
+
+def _leer(ruta):
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _sumar(totales, estado):
+    peticiones, errores, latencias = totales
+    for *k, v in estado.get("peticiones", []):
+        peticiones[tuple(k)] = peticiones.get(tuple(k), 0) + v
+    for *k, v in estado.get("errores", []):
+        errores[tuple(k)] = errores.get(tuple(k), 0) + v
+    for *k, v in estado.get("latencias", []):
+        actual = latencias.setdefault(tuple(k), [0] * len(v))
+        for i, x in enumerate(v):
+            actual[i] += x
+
+def _terminado(nombre):
+    """True si el proceso dueño de <nombre>.json ya no vive (su flock quedó libre)."""
+    if fcntl is None:
+        return False
+    try:
+        bloqueo = open(os.path.join(_directorio, f"{nombre}.lock"), "r")
+    except FileNotFoundError:
+        return True  # sin lock: formato anterior (<pid>.json) o proceso que no llegó a crearlo
+    with bloqueo:
+        try:
+            fcntl.flock(bloqueo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+def _leer_todos():
+    """Suma el estado de todos los procesos e incorpora al archivo los terminados."""
+    ruta_archivo = os.path.join(_directorio, ARCHIVADOS)
+    propio = _nombre_propio()
+    with open(os.path.join(_directorio, "archivo.lock"), "w") as bloqueo:
+        # Un solo lector a la vez: mover un worker al archivo no debe verse a medias
+        if fcntl:
+            fcntl.flock(bloqueo, fcntl.LOCK_EX)
+        archivo = _leer(ruta_archivo) or {}
+        incorporados = archivo.get("incorporados", [])
+        vivos, terminados = [], []
+        entradas = os.listdir(_directorio)
+        for entrada in entradas:
+            nombre, extension = os.path.splitext(entrada)
+            if extension != ".json" or entrada == ARCHIVADOS:
+                continue
+            if nombre != propio and _terminado(nombre):
+                terminados.append(nombre)
+            else:
+                vivos.append(nombre)
+        # Locks de procesos que terminaron sin llegar a volcar nada
+        for entrada in entradas:
+            nombre, extension = os.path.splitext(entrada)
+            if (extension == ".lock" and nombre not in ("archivo", propio)
+                    and f"{nombre}.json" not in entradas and _terminado(nombre)):
+                terminados.append(nombre)
+
+        pendientes = [n for n in terminados if n not in incorporados]
+        if pendientes:
+            acumulado = ({}, {}, {})
+            _sumar(acumulado, archivo)
+            for nombre in pendientes:
+                estado = _leer(os.path.join(_directorio, f"{nombre}.json"))
+                if estado:
+                    _sumar(acumulado, estado)
+            peticiones, errores, latencias = acumulado
+            archivo = {
+                "peticiones": [[*k, v] for k, v in peticiones.items()],
+                "errores": [[*k, v] for k, v in errores.items()],
+                "latencias": [[*k, v] for k, v in latencias.items()],
+                # Permite repetir el borrado si el proceso muere entre escribir y borrar
+                "incorporados": (incorporados + pendientes)[-MAX_INCORPORADOS:],
+            }
+            _escribir(ruta_archivo, archivo)
+        for nombre in terminados:
+            for extension in (".json", ".lock"):
+                try:
+                    os.remove(os.path.join(_directorio, nombre + extension))
+                except FileNotFoundError:
+                    pass
+
+        totales = ({}, {}, {})
+        _sumar(totales, archivo)
+        for nombre in vivos:
+            estado = _leer(os.path.join(_directorio, f"{nombre}.json"))
+            if estado:
+                _sumar(totales, estado)
+        if fcntl:
+            fcntl.flock(bloqueo, fcntl.LOCK_UN)
+    return totales
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _etiquetas_texto(**etiquetas):
+    return ",".join(f'{k}="{_escapar(v)}"' for k, v in etiquetas.items())
+
+def exposicion():
+    """Texto en formato de exposición de Prometheus (0.0.4)."""
+    _volcar(forzar=True)
+    peticiones, errores, latencias = _leer_todos()
+    lineas = [
+        "# HELP http_requests_total Peticiones HTTP atendidas.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (bp, ep, metodo, codigo), n in sorted(peticiones.items()):
+        lineas.append(f"http_requests_total{{{_etiquetas_texto(blueprint=bp, endpoint=ep, method=metodo, status=codigo)}}} {n}")
+    lineas += [
+        "# HELP http_request_errors_total Peticiones HTTP que terminaron en error 5xx.",
+        "# TYPE http_request_errors_total counter",
+    ]
+    for (bp, ep), n in sorted(errores.items()):
+        lineas.append(f"http_request_errors_total{{{_etiquetas_texto(blueprint=bp, endpoint=ep)}}} {n}")
+    lineas += [
+        "# HELP http_request_duration_seconds Latencia de las peticiones HTTP.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (bp, ep), hist in sorted(latencias.items()):
+        acumulado = 0
+        for limite, n in zip([*BUCKETS, "+Inf"], hist[:-1]):
+            acumulado += n
+            lineas.append(f"http_request_duration_seconds_bucket{{{_etiquetas_texto(blueprint=bp, endpoint=ep, le=limite)}}} {acumulado}")
+        lineas.append(f"http_request_duration_seconds_sum{{{_etiquetas_texto(blueprint=bp, endpoint=ep)}}} {hist[-1]:.6f}")
+        lineas.append(f"http_request_duration_seconds_count{{{_etiquetas_texto(blueprint=bp, endpoint=ep)}}} {acumulado}")
+    return "\n".join(lineas) + "\n"
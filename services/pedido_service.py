@@ -1,5 +1,11 @@
-from app.models import Pedido
-from app.extensions import db
+from datetime import datetime
+from sqlalchemy import case, insert, update, select, func
+from models import Pedido, PedidoItem, Producto, Cliente, Usuario
+from extensions import db
+from services import catalogo_cache, versiones, ventas_service, sesion_cache, eventos, cocina_service
+
+ESTADOS_PERMITIDOS = ["En preparación", "Listo", "Entregado", "Cancelado"]
+MAX_LOTE = 500
 
 def get_all(estado=None):
     if estado:
@@ -13,4 +19,244 @@ def update_estado(pedido_id, nuevo_estado):
     pedido = get_by_id(pedido_id)
     pedido.estado = nuevo_estado
     db.session.commit()
-    return pedido
\ No newline at end of file
+    return pedido
+
+def cliente_de_usuario(usuario):
+    """Devuelve (cliente_id, creado) del usuario; si no tiene cliente lo vincula o crea.
+
+    Sin vínculo se reutiliza un cliente con el mismo email o se crea uno nuevo,
+    y el resultado queda guardado en usuarios.cliente_id.
+    """
+    if usuario.cliente_id:
+        return usuario.cliente_id, False
+    cliente = Cliente.query.filter_by(email=usuario.mail).first()
+    creado = cliente is None
+    if creado:
+        cliente = Cliente(nombre=usuario.nombre, email=usuario.mail)
+        db.session.add(cliente)
+        db.session.flush()
+    Usuario.query.filter_by(id=usuario.id).update({"cliente_id": cliente.id})
+    db.session.commit()
+    sesion_cache.asignar_cliente(usuario, cliente.id)
+    return cliente.id, creado
+
+def crear_pedido(cliente_id, lineas, notas=""):
+    """Crea un pedido con varias líneas [(slug, cantidad), ...] en una sola transacción.
+
+    Los productos se cargan con una única consulta IN y los PedidoItem se
+    insertan en bloque. Lanza ValueError si un producto no existe o no
+    tiene stock suficiente; en ese caso no se escribe nada.
+    """
+    cantidades = {}
+    for slug, cantidad in lineas:
+        cantidades[slug] = cantidades.get(slug, 0) + cantidad
+    if not cantidades:
+        raise ValueError("Debes seleccionar un producto.")
+
+    productos = Producto.query.filter(Producto.slug.in_(list(cantidades))).all()
+    por_slug = {p.slug: p for p in productos}
+    faltantes = [slug for slug in cantidades if slug not in por_slug]
+    if faltantes:
+        raise ValueError(f"Producto no encontrado: {', '.join(faltantes)}.")
+    for slug, cantidad in cantidades.items():
+        producto = por_slug[slug]
+        if producto.stock < cantidad:
+            raise ValueError(f"Stock insuficiente para {producto.nombre}. Disponible: {producto.stock}.")
+
+    filas = []
+    total = 0.0
+    for slug, cantidad in cantidades.items():
+        producto = por_slug[slug]
+        subtotal = round(producto.precio * cantidad, 2)
+        total += subtotal
+        filas.append({
+            "producto_id": producto.id,
+            "cantidad": cantidad,
+            "precio_unitario": producto.precio,
+            "subtotal": subtotal,
+        })
+
+    try:
+        # Orden de bloqueo fijo en todos los caminos: primero las filas de
+        # productos (por id), luego el pedido; los resúmenes solo reciben
+        # deltas en resumen_pendientes, que no bloquean filas compartidas.
+        for producto in sorted((por_slug[slug] for slug in cantidades), key=lambda p: p.id):
+            if not _reservar_stock(producto.id, cantidades[producto.slug]):
+                disponible = db.session.scalar(select(Producto.stock).where(Producto.id == producto.id))
+                raise ValueError(f"Stock insuficiente para {producto.nombre}. Disponible: {disponible}.")
+        pedido = Pedido(
+            cliente_id=cliente_id,
+            fecha=datetime.now().replace(microsecond=0),
+            estado="En preparación",
+            notas=notas,
+            total=round(total, 2)
+        )
+        db.session.add(pedido)
+        db.session.flush()
+
+        for fila in filas:
+            fila["pedido_id"] = pedido.id
+        db.session.execute(insert(PedidoItem), filas)
+        dia = pedido.fecha.date()
+        ventas_service.registrar_venta(dia, [(f["producto_id"], f["cantidad"], f["subtotal"]) for f in filas])
+        ventas_service.registrar_estado(dia, None, pedido.estado)
+        cocina_service.registrar_cambio([pedido.id], pedido.estado)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    catalogo_cache.invalidate()
+    eventos.publicar("pedido", id=pedido.id, cliente_id=cliente_id, estado=pedido.estado, anterior=None)
+    return pedido
+
+def _reservar_stock(producto_id, cantidad):
+    """Descuenta stock con un UPDATE condicional atómico; False si no alcanza."""
+    resultado = db.session.execute(
+        update(Producto)
+        .where(Producto.id == producto_id, Producto.stock >= cantidad)
+        .values(stock=Producto.stock - cantidad)
+        .execution_options(synchronize_session=False)
+    )
+    return resultado.rowcount == 1
+
+def _reponer_stock(pedido_ids):
+    """Devuelve al inventario las cantidades de los pedidos con un único UPDATE.
+
+    Las cantidades se agregan por producto y se aplican con
+    stock = stock + CASE id WHEN ... END. Retorna las líneas agregadas por
+    pedido y producto [(pedido_id, producto_id, unidades, ingresos)].
+    """
+    lineas = db.session.execute(
+        select(PedidoItem.pedido_id, PedidoItem.producto_id,
+               func.sum(PedidoItem.cantidad), func.sum(PedidoItem.subtotal))
+        .where(PedidoItem.pedido_id.in_(pedido_ids))
+        .group_by(PedidoItem.pedido_id, PedidoItem.producto_id)
+    ).all()
+    por_producto = {}
+    for _, producto_id, cantidad, _ in lineas:
+        por_producto[producto_id] = por_producto.get(producto_id, 0) + cantidad
+    if por_producto:
+        db.session.execute(
+            update(Producto)
+            .where(Producto.id.in_(por_producto))
+            .values(stock=Producto.stock + case(por_producto, value=Producto.id, else_=0))
+            .execution_options(synchronize_session=False)
+        )
+    return lineas
+
+def cambiar_estado(pedido_id, nuevo_estado):
+    """Cambia el estado de un pedido; al cancelar repone su stock una sola vez.
+
+    La fila del pedido se bloquea (SELECT ... FOR UPDATE) y la transición se
+    hace con un UPDATE condicional sobre el estado, así dos cancelaciones
+    concurrentes no pueden reponer el stock dos veces. Los deltas de los
+    resúmenes de ventas se anotan en la misma transacción. Lanza ValueError si el
+    pedido no existe o ya estaba cancelado.
+    """
+    try:
+        actual = db.session.execute(
+            select(Pedido.estado, Pedido.fecha, Pedido.cliente_id).where(Pedido.id == pedido_id).with_for_update()
+        ).first()
+        if not actual:
+            raise ValueError("Pedido no encontrado.")
+        estado_anterior, fecha, cliente_id = actual
+        resultado = db.session.execute(
+            update(Pedido)
+            .where(Pedido.id == pedido_id, Pedido.estado != "Cancelado")
+            .values(estado=nuevo_estado)
+            .execution_options(synchronize_session=False)
+        )
+        cambio = resultado.rowcount == 1
+        if not cambio and nuevo_estado != "Cancelado":
+            raise ValueError("No se permite cambiar un pedido cancelado.")
+        repone_stock = cambio and nuevo_estado == "Cancelado"
+        # Mismo orden que crear_pedido: stock antes que los resúmenes
+        if repone_stock:
+            lineas = [(producto_id, unidades, ingresos)
+                      for _, producto_id, unidades, ingresos in _reponer_stock([pedido_id])]
+            ventas_service.registrar_venta(fecha.date(), lineas, signo=-1)
+            versiones.incrementar("productos")
+        if cambio and estado_anterior != nuevo_estado:
+            ventas_service.registrar_estado(fecha.date(), estado_anterior, nuevo_estado)
+            cocina_service.registrar_cambio([pedido_id], nuevo_estado)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if repone_stock:
+        catalogo_cache.invalidate()
+    if cambio and estado_anterior != nuevo_estado:
+        eventos.publicar("pedido", id=pedido_id, cliente_id=cliente_id, estado=nuevo_estado, anterior=estado_anterior)
+
+def cambiar_estado_lote(pedido_ids, nuevo_estado):
+    """Cambia el estado de varios pedidos en una sola transacción.
+
+    Todo o nada: si algún pedido no existe o está cancelado (y el destino no
+    es "Cancelado") no se cambia ninguno. Los pedidos que ya tienen el estado
+    destino se omiten. Al cancelar, el stock se repone con un único UPDATE
+    agregado por producto. Devuelve {"cambiados": [...], "sin_cambio": [...]}.
+    """
+    if nuevo_estado not in ESTADOS_PERMITIDOS:
+        raise ValueError("Estado no válido.")
+    ids = sorted({int(i) for i in pedido_ids})
+    if not ids:
+        raise ValueError("No se seleccionó ningún pedido.")
+    if len(ids) > MAX_LOTE:
+        raise ValueError(f"Como máximo {MAX_LOTE} pedidos por lote.")
+
+    try:
+        # Bloqueo en orden de id para no cruzarse con otros lotes concurrentes
+        actuales = db.session.execute(
+            select(Pedido.id, Pedido.estado, Pedido.fecha, Pedido.cliente_id)
+            .where(Pedido.id.in_(ids))
+            .order_by(Pedido.id)
+            .with_for_update()
+        ).all()
+        faltan = set(ids) - {p.id for p in actuales}
+        if faltan:
+            raise ValueError("Pedidos no encontrados: " + ", ".join(f"#{i}" for i in sorted(faltan)))
+        bloqueados = [p.id for p in actuales if p.estado == "Cancelado" and nuevo_estado != "Cancelado"]
+        if bloqueados:
+            raise ValueError("No se permite cambiar pedidos cancelados: "
+                             + ", ".join(f"#{i}" for i in bloqueados))
+
+        cambian = [p for p in actuales if p.estado != nuevo_estado]
+        if cambian:
+            ids_cambian = [p.id for p in cambian]
+            resultado = db.session.execute(
+                update(Pedido)
+                .where(Pedido.id.in_(ids_cambian), Pedido.estado != "Cancelado")
+                .values(estado=nuevo_estado)
+                .execution_options(synchronize_session=False)
+            )
+            if resultado.rowcount != len(ids_cambian):
+                raise ValueError("Algunos pedidos cambiaron mientras se procesaba el lote. Inténtalo de nuevo.")
+            # Mismo orden que crear_pedido: stock antes que los resúmenes
+            if nuevo_estado == "Cancelado":
+                dia_de = {p.id: p.fecha.date() for p in cambian}
+                ventas = {}
+                for pedido_id, producto_id, unidades, ingresos in _reponer_stock(ids_cambian):
+                    clave = (dia_de[pedido_id], producto_id)
+                    u, i = ventas.get(clave, (0, 0.0))
+                    ventas[clave] = (u + unidades, i + ingresos)
+                por_dia = {}
+                for (dia, producto_id), (unidades, ingresos) in ventas.items():
+                    por_dia.setdefault(dia, []).append((producto_id, unidades, ingresos))
+                for dia, lineas in por_dia.items():
+                    ventas_service.registrar_venta(dia, lineas, signo=-1)
+                versiones.incrementar("productos")
+            ventas_service.registrar_estados([(p.fecha.date(), p.estado, nuevo_estado) for p in cambian])
+            cocina_service.registrar_cambio(ids_cambian, nuevo_estado)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if cambian and nuevo_estado == "Cancelado":
+        catalogo_cache.invalidate()
+    for p in cambian:
+        eventos.publicar("pedido", id=p.id, cliente_id=p.cliente_id, estado=nuevo_estado, anterior=p.estado)
+    return {
+        "cambiados": [p.id for p in cambian],
+        "sin_cambio": [p.id for p in actuales if p.estado == nuevo_estado],
+    }
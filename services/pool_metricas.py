@@ -0,0 +1,76 @@
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Pool de conexiones que además mide cuánto esperan las peticiones para
+# obtener una conexión; sirve para dimensionar DB_POOL_SIZE según el número
+# de workers de gunicorn (cada worker tiene su propio pool).
+
+class PoolMedido(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metricas_lock = threading.Lock()
+        self.obtenidas = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.agotadas = 0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        agotada = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            agotada = True
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._metricas_lock:
+                self.obtenidas += 1
+                self.espera_total += espera
+                self.espera_max = max(self.espera_max, espera)
+                if agotada:
+                    self.agotadas += 1
+
+def opciones_motor(config):
+    """SQLALCHEMY_ENGINE_OPTIONS a partir de los valores DB_* de la configuración."""
+    opciones = {
+        "poolclass": PoolMedido,
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+    if config["SQLALCHEMY_DATABASE_URI"].startswith("mysql"):
+        opciones["connect_args"] = {
+            "connect_timeout": config["DB_CONNECT_TIMEOUT"],
+            "read_timeout": config["DB_READ_TIMEOUT"],
+            "write_timeout": config["DB_READ_TIMEOUT"],
+        }
+    return opciones
+
+def estadisticas(engine):
+    pool = engine.pool
+    datos = {"pool": type(pool).__name__, "estado": pool.status()}
+    if isinstance(pool, QueuePool):
+        datos.update({
+            "tamano": pool.size(),
+            "en_uso": pool.checkedout(),
+            "libres": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, PoolMedido):
+        with pool._metricas_lock:
+            obtenidas = pool.obtenidas
+            datos.update({
+                "obtenidas": obtenidas,
+                "agotadas": pool.agotadas,
+                "espera_total_ms": round(pool.espera_total * 1000, 3),
+                "espera_media_ms": round(pool.espera_total * 1000 / obtenidas, 3) if obtenidas else 0.0,
+                "espera_max_ms": round(pool.espera_max * 1000, 3),
+            })
+    return datos
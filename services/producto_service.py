@@ -1,23 +1,32 @@
 from models import Producto
 from extensions import db
+from services import catalogo_cache, versiones
 
 def get_all():
     return Producto.query.order_by(Producto.nombre).all()
 
+def iter_all(tamano_lote=500):
+    """Recorre todos los registros por lotes (yield_per) sin cargarlos de golpe."""
+    return Producto.query.order_by(Producto.nombre, Producto.id).yield_per(tamano_lote)
+
 def get_by_id(id):
     return Producto.query.get_or_404(id)
 
 def create(data):
     producto = Producto(**data)
     db.session.add(producto)
+    versiones.incrementar("productos")
     db.session.commit()
+    catalogo_cache.invalidate()
     return producto
 
 def update(id, data):
     producto = get_by_id(id)
     for key, value in data.items():
         setattr(producto, key, value)
+    versiones.incrementar("productos")
     db.session.commit()
+    catalogo_cache.invalidate()
     return producto
 
 def delete(id):
@@ -25,4 +34,6 @@ def delete(id):
     if producto.pedido_items:
         raise ValueError("No se puede eliminar porque tiene pedidos asociados")
     db.session.delete(producto)
-    db.session.commit()
\ No newline at end of file
+    versiones.incrementar("productos")
+    db.session.commit()
+    catalogo_cache.invalidate()
@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import select
+from models import Usuario
+from extensions import db
+
+# Caché de la identidad del usuario autenticado para el user_loader: evita
+# consultar usuarios (y su cliente) en cada petición. Es por proceso, con TTL
+# corto y tamaño máximo (LRU); usuario_service la invalida al escribir y
+# cliente_service al borrar un cliente vinculado; el TTL acota el desfase
+# entre workers de gunicorn.
+DEFAULT_TTL = 30
+DEFAULT_MAX = 1000
+
+_lock = threading.Lock()
+_entradas = OrderedDict()  # id -> (expira, UsuarioSesion)
+_hits = 0
+_misses = 0
+
+class UsuarioSesion(UserMixin):
+    """Vista ligera e inmutable del usuario para current_user."""
+    __slots__ = ("id", "nombre", "mail", "rol", "cliente_id")
+
+    def __init__(self, id, nombre, mail, rol, cliente_id):
+        self.id = id
+        self.nombre = nombre
+        self.mail = mail
+        self.rol = rol
+        self.cliente_id = cliente_id
+
+    @property
+    def es_admin(self):
+        return self.rol == 'admin'
+
+def _consultar(usuario_id):
+    fila = db.session.execute(
+        select(Usuario.id, Usuario.nombre, Usuario.mail, Usuario.rol, Usuario.cliente_id)
+        .where(Usuario.id == usuario_id)
+    ).first()
+    return UsuarioSesion(*fila) if fila else None
+
+def cargar(usuario_id):
+    """Devuelve el UsuarioSesion de usuario_id (o None si ya no existe)."""
+    global _hits, _misses
+    ahora = time.monotonic()
+    with _lock:
+        entrada = _entradas.get(usuario_id)
+        if entrada and entrada[0] > ahora:
+            _entradas.move_to_end(usuario_id)
+            _hits += 1
+            return entrada[1]
+        _misses += 1
+    usuario = _consultar(usuario_id)
+    if usuario is not None:
+        _guardar(usuario, ahora)
+    return usuario
+
+def _guardar(usuario, ahora):
+    ttl = current_app.config.get("SESION_CACHE_TTL", DEFAULT_TTL)
+    maximo = current_app.config.get("SESION_CACHE_MAX", DEFAULT_MAX)
+    with _lock:
+        _entradas[usuario.id] = (ahora + ttl, usuario)
+        _entradas.move_to_end(usuario.id)
+        while len(_entradas) > maximo:
+            _entradas.popitem(last=False)
+
+def asignar_cliente(usuario, cliente_id):
+    """Actualiza en caché el cliente vinculado tras crearlo para el usuario."""
+    _guardar(UsuarioSesion(usuario.id, usuario.nombre, usuario.mail, usuario.rol, cliente_id),
+             time.monotonic())
+
+def invalidar(usuario_id):
+    with _lock:
+        _entradas.pop(usuario_id, None)
+
+def invalidar_todo():
+    with _lock:
+        _entradas.clear()
+
+def stats():
+    with _lock:
+        return {"hits": _hits, "misses": _misses, "entradas": len(_entradas)}
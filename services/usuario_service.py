@@ -1,15 +1,21 @@
 from models import Usuario
 from extensions import db
+from services import versiones, sesion_cache
 
 def get_all():
     return Usuario.query.order_by(Usuario.nombre).all()
 
+def iter_all(tamano_lote=500):
+    """Recorre todos los registros por lotes (yield_per) sin cargarlos de golpe."""
+    return Usuario.query.order_by(Usuario.nombre, Usuario.id).yield_per(tamano_lote)
+
 def get_by_id(id):
     return Usuario.query.get_or_404(id)
 
 def create(data):
     usuario = Usuario(**data)
     db.session.add(usuario)
+    versiones.incrementar("usuarios")
     db.session.commit()
     return usuario
 
@@ -17,10 +23,14 @@ def update(id, data):
     usuario = get_by_id(id)
     for key, value in data.items():
         setattr(usuario, key, value)
+    versiones.incrementar("usuarios")
     db.session.commit()
+    sesion_cache.invalidar(usuario.id)
     return usuario
 
 def delete(id):
     usuario = get_by_id(id)
     db.session.delete(usuario)
-    db.session.commit()
\ No newline at end of file
+    versiones.incrementar("usuarios")
+    db.session.commit()
+    sesion_cache.invalidar(id)
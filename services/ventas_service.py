@@ -0,0 +1,167 @@
+from datetime import date, timedelta
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import mysql, sqlite
+from models import Pedido, PedidoItem, Producto, VentaDiaria, PedidosDiarios, ResumenPendiente
+from extensions import db
+
+# Resúmenes diarios de ventas. La transacción que crea o cambia un pedido solo
+# inserta sus deltas en resumen_pendientes (sin bloquear filas compartidas,
+# así los pedidos no se serializan en la fila de "hoy"); consolidar() los
+# suma a ventas_diarias/pedidos_diarios por lotes y resumen() consolida antes
+# de leer, de modo que nunca quedan desfasados. reconstruir() recalcula todo.
+LOTE_CONSOLIDACION = 5000
+
+def _incrementar(modelo, claves, filas):
+    """Suma los valores de filas a las existentes (upsert por clave primaria)."""
+    if not filas:
+        return
+    columnas = [c for c in filas[0] if c not in claves]
+    dialecto = db.session.get_bind().dialect.name
+    if dialecto == "mysql":
+        stmt = mysql.insert(modelo).values(filas)
+        stmt = stmt.on_duplicate_key_update(
+            {c: getattr(modelo, c) + stmt.inserted[c] for c in columnas}
+        )
+        db.session.execute(stmt)
+    elif dialecto == "sqlite":
+        stmt = sqlite.insert(modelo).values(filas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=claves,
+            set_={c: getattr(modelo, c) + stmt.excluded[c] for c in columnas},
+        )
+        db.session.execute(stmt)
+    else:
+        for fila in filas:
+            condicion = [getattr(modelo, k) == fila[k] for k in claves]
+            resultado = db.session.execute(
+                update(modelo).where(*condicion)
+                .values({c: getattr(modelo, c) + fila[c] for c in columnas})
+            )
+            if resultado.rowcount == 0:
+                db.session.execute(insert(modelo).values(fila))
+
+def _anotar(filas):
+    if filas:
+        db.session.execute(insert(ResumenPendiente), filas)
+
+def registrar_venta(dia, lineas, signo=1):
+    """Anota (o resta, con signo=-1) las líneas [(producto_id, unidades, ingresos)]."""
+    _anotar([
+        {"dia": dia, "producto_id": producto_id, "unidades": signo * unidades,
+         "ingresos": round(signo * ingresos, 2), "cantidad": 0}
+        for producto_id, unidades, ingresos in lineas
+    ])
+
+def registrar_estado(dia, estado_anterior, estado_nuevo):
+    """Mueve un pedido del contador de estado_anterior al de estado_nuevo."""
+    registrar_estados([(dia, estado_anterior, estado_nuevo)])
+
+def registrar_estados(cambios):
+    """Versión por lotes de registrar_estado: [(dia, estado_anterior, estado_nuevo)]."""
+    acumulado = {}
+    for dia, anterior, nuevo in cambios:
+        if anterior:
+            acumulado[(dia, anterior)] = acumulado.get((dia, anterior), 0) - 1
+        if nuevo:
+            acumulado[(dia, nuevo)] = acumulado.get((dia, nuevo), 0) + 1
+    _anotar([{"dia": dia, "estado": estado, "unidades": 0, "ingresos": 0, "cantidad": cantidad}
+             for (dia, estado), cantidad in acumulado.items() if cantidad])
+
+def consolidar(tamano_lote=LOTE_CONSOLIDACION):
+    """Suma los deltas pendientes a los resúmenes y los borra; devuelve cuántos aplicó.
+
+    Cada lote bloquea sus deltas (FOR UPDATE), así dos consolidaciones
+    concurrentes no pueden aplicar el mismo delta dos veces.
+    """
+    aplicados = 0
+    while True:
+        try:
+            deltas = db.session.execute(
+                select(ResumenPendiente).order_by(ResumenPendiente.id).limit(tamano_lote).with_for_update()
+            ).scalars().all()
+            if not deltas:
+                db.session.commit()
+                return aplicados
+            ventas, estados = {}, {}
+            for d in deltas:
+                if d.producto_id is not None:
+                    u, i = ventas.get((d.dia, d.producto_id), (0, 0.0))
+                    ventas[(d.dia, d.producto_id)] = (u + d.unidades, i + d.ingresos)
+                if d.estado:
+                    estados[(d.dia, d.estado)] = estados.get((d.dia, d.estado), 0) + d.cantidad
+            # Mismo orden de claves en todas las consolidaciones
+            _incrementar(VentaDiaria, ["dia", "producto_id"], [
+                {"dia": dia, "producto_id": producto_id, "unidades": u, "ingresos": round(i, 2)}
+                for (dia, producto_id), (u, i) in sorted(ventas.items())
+            ])
+            _incrementar(PedidosDiarios, ["dia", "estado"], [
+                {"dia": dia, "estado": estado, "cantidad": n}
+                for (dia, estado), n in sorted(estados.items()) if n
+            ])
+            db.session.execute(delete(ResumenPendiente).where(ResumenPendiente.id.in_([d.id for d in deltas])))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        aplicados += len(deltas)
+        if len(deltas) < tamano_lote:
+            return aplicados
+
+def reconstruir():
+    """Recalcula ambos resúmenes desde pedidos y pedido_items."""
+    dia = func.date(Pedido.fecha)
+    try:
+        db.session.execute(delete(ResumenPendiente))
+        db.session.execute(delete(VentaDiaria))
+        db.session.execute(delete(PedidosDiarios))
+        db.session.execute(insert(VentaDiaria).from_select(
+            ["dia", "producto_id", "unidades", "ingresos"],
+            select(dia, PedidoItem.producto_id, func.sum(PedidoItem.cantidad), func.sum(PedidoItem.subtotal))
+            .join(Pedido, Pedido.id == PedidoItem.pedido_id)
+            .where(Pedido.estado != "Cancelado")
+            .group_by(dia, PedidoItem.producto_id)
+        ))
+        db.session.execute(insert(PedidosDiarios).from_select(
+            ["dia", "estado", "cantidad"],
+            select(dia, Pedido.estado, func.count(Pedido.id)).group_by(dia, Pedido.estado)
+        ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def resumen(desde, hasta):
+    """Agregados del rango [desde, hasta] leyendo solo las tablas de resumen."""
+    consolidar()
+    en_rango = lambda modelo: (modelo.dia >= desde, modelo.dia <= hasta)
+
+    por_producto = db.session.execute(
+        select(Producto.nombre, func.sum(VentaDiaria.unidades), func.sum(VentaDiaria.ingresos))
+        .join(Producto, Producto.id == VentaDiaria.producto_id)
+        .where(*en_rango(VentaDiaria))
+        .group_by(Producto.id, Producto.nombre)
+        .order_by(func.sum(VentaDiaria.ingresos).desc())
+    ).all()
+    por_dia = db.session.execute(
+        select(VentaDiaria.dia, func.sum(VentaDiaria.unidades), func.sum(VentaDiaria.ingresos))
+        .where(*en_rango(VentaDiaria))
+        .group_by(VentaDiaria.dia)
+        .order_by(VentaDiaria.dia.desc())
+    ).all()
+    por_estado = db.session.execute(
+        select(PedidosDiarios.estado, func.sum(PedidosDiarios.cantidad))
+        .where(*en_rango(PedidosDiarios))
+        .group_by(PedidosDiarios.estado)
+    ).all()
+
+    return {
+        "productos": [{"nombre": n, "unidades": int(u or 0), "ingresos": float(i or 0)} for n, u, i in por_producto],
+        "dias": [{"dia": d, "unidades": int(u or 0), "ingresos": float(i or 0)} for d, u, i in por_dia],
+        "estados": {e: int(c or 0) for e, c in por_estado},
+        "ingresos": round(sum(float(i or 0) for _, _, i in por_producto), 2),
+        "unidades": sum(int(u or 0) for _, u, _ in por_producto),
+    }
+
+def rango_por_defecto(dias=30):
+    hoy = date.today()
+    return hoy - timedelta(days=dias - 1), hoy
@@ -0,0 +1,44 @@
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects import mysql, sqlite
+from models import TablaVersion
+from extensions import db
+
+# Contador de cambios por tabla guardado en la base de datos (tabla_versiones).
+# Los servicios lo incrementan antes del commit de la escritura, así que todos
+# los workers ven el mismo valor y sobrevive a reinicios. Junto con COUNT(*) y
+# MAX(id) forma una huella barata de la versión de la tabla.
+
+def incrementar(tabla):
+    """Suma 1 a la versión de la tabla dentro de la transacción en curso (sin commit)."""
+    dialecto = db.session.get_bind().dialect.name
+    if dialecto == "mysql":
+        stmt = mysql.insert(TablaVersion).values(tabla=tabla, version=1)
+        db.session.execute(stmt.on_duplicate_key_update(version=TablaVersion.version + 1))
+    elif dialecto == "sqlite":
+        stmt = sqlite.insert(TablaVersion).values(tabla=tabla, version=1)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=["tabla"], set_={"version": TablaVersion.version + 1}
+        ))
+    else:
+        resultado = db.session.execute(
+            update(TablaVersion).where(TablaVersion.tabla == tabla)
+            .values(version=TablaVersion.version + 1)
+        )
+        if resultado.rowcount == 0:
+            db.session.execute(insert(TablaVersion).values(tabla=tabla, version=1))
+
+def contador(tabla):
+    return db.session.scalar(select(TablaVersion.version).where(TablaVersion.tabla == tabla)) or 0
+
+def huella(modelo, *extras):
+    """Devuelve 'tabla-count-maxid-version[-extras]' con una sola consulta.
+
+    extras son expresiones escalares que también cambian con la tabla sin
+    pasar por incrementar() (p. ej. el stock que descuentan los pedidos).
+    """
+    tabla = modelo.__tablename__
+    version = select(TablaVersion.version).where(TablaVersion.tabla == tabla).scalar_subquery()
+    total, max_id, actual, *resto = db.session.execute(
+        select(func.count(modelo.id), func.max(modelo.id), version, *extras)
+    ).one()
+    return "-".join([tabla, str(total), str(max_id or 0), str(actual or 0), *(str(x or 0) for x in resto)])
@@ -0,0 +1,31 @@
+import os
+import pytest
+import config
+from extensions import db
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """App contra un SQLite temporal (o TEST_DATABASE_URL, p. ej. un MySQL de pruebas)."""
+    url = os.environ.get("TEST_DATABASE_URL") or "sqlite:///" + str(tmp_path_factory.mktemp("db") / "test.db")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(config.Config, "SQLALCHEMY_DATABASE_URI", url)
+        mp.setattr(config.Config, "TESTING", True, raising=False)
+        mp.setattr(config.Config, "DB_POOL_SIZE", 10)
+        mp.setattr(config.Config, "DB_MAX_OVERFLOW", 20)
+        from app import create_app
+        app = create_app()
+    with app.app_context():
+        import models  # registra todos los modelos en db.metadata
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        yield
+        db.session.remove()
@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import event, func, select, update
+from extensions import db
+from models import (
+    Cliente, Pedido, PedidoCambio, PedidoItem, PedidosDiarios, Producto, ResumenPendiente, VentaDiaria,
+)
+from services.pedido_service import crear_pedido
+
+
+def _foto():
+    """Filas y totales de todo lo que escribe crear_pedido."""
+    db.session.expire_all()
+    return {
+        "pedidos": db.session.scalar(select(func.count(Pedido.id))),
+        "items": db.session.scalar(select(func.count(PedidoItem.id))),
+        "cambios": db.session.scalar(select(func.count(PedidoCambio.id))),
+        "pendientes": db.session.scalar(select(func.count(ResumenPendiente.id))),
+        "ventas": db.session.execute(
+            select(func.count(), func.sum(VentaDiaria.unidades), func.sum(VentaDiaria.ingresos))
+        ).one(),
+        "estados": db.session.execute(select(func.count(), func.sum(PedidosDiarios.cantidad))).one(),
+    }
+
+
+def test_crear_pedido_sin_stock_no_deja_rastro(app, ctx):
+    cliente = Cliente(nombre="Sin Stock")
+    con_stock = Producto(slug="rastro-a", nombre="Rastro A", precio=3.0, stock=5)
+    agotado = Producto(slug="rastro-b", nombre="Rastro B", precio=4.0, stock=5)
+    db.session.add_all([cliente, con_stock, agotado])
+    db.session.commit()
+    con_stock_id, agotado_id = con_stock.id, agotado.id
+    antes = _foto()
+
+    # Otro proceso se lleva el stock de B entre la validación y la reserva,
+    # cuando crear_pedido ya va a descontar A
+    vaciado = []
+
+    def vaciar_b(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE productos") and not vaciado:
+            vaciado.append(True)
+            with db.engine.begin() as otra:
+                otra.execute(update(Producto).where(Producto.id == agotado_id).values(stock=0))
+
+    event.listen(db.engine, "before_cursor_execute", vaciar_b)
+    try:
+        with pytest.raises(ValueError, match="Stock insuficiente para Rastro B"):
+            crear_pedido(cliente.id, [("rastro-a", 2), ("rastro-b", 1)])
+    finally:
+        event.remove(db.engine, "before_cursor_execute", vaciar_b)
+
+    assert _foto() == antes
+    assert db.session.scalar(select(func.count(Pedido.id)).where(Pedido.cliente_id == cliente.id)) == 0
+    assert db.session.get(Producto, con_stock_id).stock == 5
+    assert db.session.get(Producto, agotado_id).stock == 0
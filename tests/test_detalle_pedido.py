@@ -0,0 +1,48 @@
+from datetime import datetime
+from sqlalchemy import event
+from extensions import db
+from models import Cliente, Pedido, PedidoItem, Producto
+from routes.pedidos import _cargar_detalle, _detalle_dict
+
+
+def _crear_pedido(cliente, productos):
+    pedido = Pedido(cliente_id=cliente.id, fecha=datetime.now(), estado="En preparación", total=0)
+    db.session.add(pedido)
+    db.session.flush()
+    for producto in productos:
+        db.session.add(PedidoItem(pedido_id=pedido.id, producto_id=producto.id, cantidad=1,
+                                  precio_unitario=producto.precio, subtotal=producto.precio))
+    db.session.commit()
+    return pedido.id
+
+
+def _consultas_detalle(pedido_id):
+    """Sentencias SQL ejecutadas al cargar y recorrer el detalle de un pedido."""
+    db.session.expunge_all()
+    sentencias = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", contar)
+    try:
+        pedido = _cargar_detalle(pedido_id)
+        _detalle_dict(pedido)  # toca cliente, líneas y productos
+    finally:
+        event.remove(db.engine, "before_cursor_execute", contar)
+    return len(sentencias)
+
+
+def test_detalle_pedido_consultas_constantes(ctx):
+    cliente = Cliente(nombre="Detalle Pedido")
+    productos = [Producto(slug=f"detalle-{i}", nombre=f"Detalle {i}", precio=1.0 + i, stock=10)
+                 for i in range(12)]
+    db.session.add_all([cliente, *productos])
+    db.session.commit()
+
+    una_linea = _crear_pedido(cliente, productos[:1])
+    varias_lineas = _crear_pedido(cliente, productos)
+
+    consultas = _consultas_detalle(una_linea)
+    assert consultas == _consultas_detalle(varias_lineas)
+    assert consultas == 1
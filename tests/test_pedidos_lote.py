@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import select
+from extensions import db
+from models import Cliente, Pedido, Producto, Usuario
+from services.pedido_service import MAX_LOTE, cambiar_estado, cambiar_estado_lote, crear_pedido
+
+
+def _producto(slug, stock=10):
+    producto = Producto(slug=slug, nombre=slug.title(), precio=2.5, stock=stock)
+    db.session.add(producto)
+    db.session.commit()
+    return producto
+
+
+def _cliente():
+    cliente = Cliente(nombre="Cliente Lote")
+    db.session.add(cliente)
+    db.session.commit()
+    return cliente
+
+
+def _stock(producto_id):
+    db.session.expire_all()
+    return db.session.scalar(select(Producto.stock).where(Producto.id == producto_id))
+
+
+def _estados(ids):
+    db.session.expire_all()
+    return [db.session.get(Pedido, i).estado for i in ids]
+
+
+def test_lote_con_cancelado_no_cambia_ninguno(ctx):
+    producto = _producto("lote-todo-o-nada")
+    cliente = _cliente()
+    ids = [crear_pedido(cliente.id, [(producto.slug, 1)]).id for _ in range(3)]
+    cambiar_estado(ids[1], "Cancelado")
+
+    with pytest.raises(ValueError, match="cancelados"):
+        cambiar_estado_lote(ids, "Listo")
+
+    assert _estados(ids) == ["En preparación", "Cancelado", "En preparación"]
+
+
+def test_cancelar_lote_repone_stock_una_vez(ctx):
+    a = _producto("lote-reponer-a")
+    b = _producto("lote-reponer-b")
+    cliente = _cliente()
+    ids = [
+        crear_pedido(cliente.id, [(a.slug, 2), (b.slug, 1)]).id,
+        crear_pedido(cliente.id, [(a.slug, 3)]).id,
+    ]
+    assert (_stock(a.id), _stock(b.id)) == (5, 9)
+
+    resultado = cambiar_estado_lote(ids, "Cancelado")
+    assert resultado == {"cambiados": ids, "sin_cambio": []}
+    assert (_stock(a.id), _stock(b.id)) == (10, 10)
+
+    # Repetir la cancelación no vuelve a reponer
+    resultado = cambiar_estado_lote(ids, "Cancelado")
+    assert resultado == {"cambiados": [], "sin_cambio": ids}
+    assert (_stock(a.id), _stock(b.id)) == (10, 10)
+
+
+def test_lote_respeta_max_lote(ctx):
+    with pytest.raises(ValueError, match=str(MAX_LOTE)):
+        cambiar_estado_lote(range(1, MAX_LOTE + 2), "Listo")
+
+
+@pytest.mark.parametrize("volver", ["//evil.example/x", "/\\evil.example/x", "https://evil.example/"])
+def test_lote_no_redirige_fuera(app, volver):
+    with app.app_context():
+        if not Usuario.query.filter_by(mail="admin-lote@test").first():
+            admin = Usuario(nombre="Admin", mail="admin-lote@test", rol="admin")
+            admin.set_password("x")
+            db.session.add(admin)
+            db.session.commit()
+    cliente = app.test_client()
+    cliente.post("/auth/login", data={"email": "admin-lote@test", "password": "x"})
+
+    respuesta = cliente.post("/pedidos/estado-lote", data={"estado": "Listo", "volver": volver + "?estado=Listo"})
+    assert respuesta.status_code == 302
+    assert respuesta.headers["Location"] == "/pedidos/?estado=Listo"
@@ -0,0 +1,47 @@
+import threading
+from sqlalchemy import select
+from extensions import db
+from models import Producto
+from services.pedido_service import _reservar_stock
+
+HILOS = 20
+STOCK_INICIAL = 8
+
+
+def test_reservas_concurrentes_no_sobrevenden(app, ctx):
+    producto = Producto(slug="concurrencia", nombre="Concurrencia", precio=1.0, stock=STOCK_INICIAL)
+    db.session.add(producto)
+    db.session.commit()
+    producto_id = producto.id
+
+    barrera = threading.Barrier(HILOS)
+    resultados = []
+    errores = []
+    lock = threading.Lock()
+
+    def reservar():
+        with app.app_context():
+            try:
+                barrera.wait()
+                ok = _reservar_stock(producto_id, 1)
+                db.session.commit()
+                with lock:
+                    resultados.append(ok)
+            except Exception as e:
+                db.session.rollback()
+                with lock:
+                    errores.append(e)
+            finally:
+                db.session.remove()
+
+    hilos = [threading.Thread(target=reservar) for _ in range(HILOS)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert errores == []
+    assert resultados.count(True) == STOCK_INICIAL
+    assert resultados.count(False) == HILOS - STOCK_INICIAL
+    db.session.expire_all()
+    assert db.session.scalar(select(Producto.stock).where(Producto.id == producto_id)) == 0
@@ -0,0 +1,15 @@
+import re
+
+# Reglas de validación compartidas por /datos, pedidos e importaciones masivas
+
+def validar_nombre(nombre):
+    """Solo letras y espacios"""
+    return re.match(r'^[A-Za-zÁÉÍÓÚáéíóúñÑ ]+$', nombre) is not None
+
+def validar_cedula(cedula):
+    """Exactamente 10 dígitos numéricos"""
+    return re.match(r'^\d{10}$', cedula) is not None
+
+def validar_telefono(telefono):
+    """Comienza con 09 y 10 dígitos en total"""
+    return re.match(r'^09\d{8}$', telefono) is not None